@@ -0,0 +1,227 @@
+"""
+向量化统计：用 NumPy 在整列数据上一次算完，代替逐条记录的 Python 循环
+- build_index / daily_rollup: DataManager 重建逻辑日期索引和按日统计时使用 (启动、修改 day_offset_hour)
+- week_stats / month_stats_heatmap / year_stats: 直接从列数据计算，返回值与 DataManager.get_*_stats 完全相同的结构，
+  供离线工具和等价性检查使用 (界面查询走按日统计，一次只看几百天，不需要扫描全部记录)
+没有安装 NumPy 时 HAVE_NUMPY 为 False，DataManager 退回原来的纯 Python 实现
+
+等价性检查 (纯 Python 实现 vs 向量化实现):
+    python aggregation.py                      # 默认 5万条模拟记录，含空白日、跨零点和分界点附近的记录
+    python aggregation.py --records 1000000 --seed 3
+"""
+import calendar
+import datetime
+
+from data_manager import date_from_index, day_index
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+# 置为 False 时 DataManager 默认使用纯 Python 实现 (单个 DataManager 可以用 vectorize 参数指定)
+USE_NUMPY = HAVE_NUMPY
+
+
+def enabled():
+    return HAVE_NUMPY and USE_NUMPY
+
+
+def columns(store):
+    """RecordStore 的开始秒数/结束秒数/时长列 -> NumPy 数组 (直接共享 array 的内存，不复制)"""
+    if not len(store):
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    return (np.frombuffer(store.starts, dtype=np.int64), np.frombuffer(store.ends, dtype=np.int64),
+            np.frombuffer(store.durations, dtype=np.float64))
+
+
+def _day_and_hour(starts, shift):
+    """逻辑日序号与开始小时 (NumPy 的 // 和 % 对负数的取整方式与 Python 一致)"""
+    return (starts - shift) // 86400, starts // 3600 % 24
+
+
+def day_segments(starts, ends, durations, shift):
+    """
+    按逻辑日分界点拆分后的 (逻辑日, 秒数) 两列，与 data_manager.split_by_logical_day 逐条拆分的结果相同
+    不跨分界点的记录原样保留；跨天的记录用 repeat 展开成每天一段，再按覆盖比例分摊时长
+    """
+    first = (starts - shift) // 86400
+    last = np.where(ends > starts, (ends - 1 - shift) // 86400, first)
+    multi = np.flatnonzero(last > first)
+    if not len(multi):
+        return first, durations
+    single = last == first
+    n_seg = (last - first + 1)[multi]
+    rec = np.repeat(multi, n_seg)
+    days = first[rec] + (np.arange(len(rec)) - np.repeat(np.cumsum(n_seg) - n_seg, n_seg))
+    lo = np.maximum(starts[rec], days * 86400 + shift)
+    hi = np.minimum(ends[rec], (days + 1) * 86400 + shift)
+    seconds = durations[rec] * (hi - lo) / (ends[rec] - starts[rec])
+    return np.concatenate([first[single], days]), np.concatenate([durations[single], seconds])
+
+
+# ===========================
+# DataManager 使用：索引 + 按日统计
+# ===========================
+def build_index(starts, shift):
+    """按开始时间的稳定排序，返回 (记录下标, 对应的逻辑日序号)，与 sorted(range(n), key=starts) 顺序一致"""
+    ids = np.argsort(starts, kind="stable")
+    keys = (starts[ids] - shift) // 86400
+    return ids, keys
+
+
+def daily_rollup(starts, ends, durations, shift):
+    """
+    {逻辑日: [总秒数, 条数, 24小时开始分布]}，与逐条 _rollup_add 累加的结果相同
+    总秒数按拆分后的时长累计；条数和开始分布记在开始的逻辑日 (它一定也有一段时长，所以天集合就是拆分后的天)
+    """
+    if not len(starts):
+        return {}
+    seg_days, seg_seconds = day_segments(starts, ends, durations, shift)
+    days, hours = _day_and_hour(starts, shift)
+    uniq, seg_inverse = np.unique(seg_days, return_inverse=True)
+    n = len(uniq)
+    inverse = np.searchsorted(uniq, days)
+    totals = np.bincount(seg_inverse, weights=seg_seconds, minlength=n)
+    counts = np.bincount(inverse, minlength=n)
+    dist = np.bincount(inverse * 24 + hours, minlength=n * 24).reshape(n, 24)
+    return {day: [total, count, hist]
+            for day, total, count, hist in zip(uniq.tolist(), totals.tolist(), counts.tolist(), dist.tolist())}
+
+
+# ===========================
+# 直接从列数据计算报表 (返回值与 DataManager.get_*_stats 相同)
+# ===========================
+def _select(starts, ends, durations, shift, first, last):
+    """范围内的 (拆分后各段相对 first 的天数, 各段秒数, 开始落在范围内的记录的开始小时)"""
+    seg_days, seg_seconds = day_segments(starts, ends, durations, shift)
+    seg_mask = (seg_days >= first) & (seg_days <= last)
+    days, hours = _day_and_hour(starts, shift)
+    mask = (days >= first) & (days <= last)
+    return seg_days[seg_mask] - first, seg_seconds[seg_mask], hours[mask]
+
+
+def week_stats(starts, ends, durations, shift, anchor_date):
+    start_of_week = anchor_date - datetime.timedelta(days=anchor_date.weekday())
+    end_of_week = start_of_week + datetime.timedelta(days=6)
+    first = day_index(start_of_week)
+    offsets, seconds, hours = _select(starts, ends, durations, shift, first, first + 6)
+
+    daily_hours = (np.bincount(offsets, weights=seconds, minlength=7) / 3600.0).tolist()
+    start_hour_dist = np.bincount(hours, minlength=24).tolist()
+    date_str = f"{start_of_week.strftime('%Y-%m-%d')} 至 {end_of_week.strftime('%Y-%m-%d')}"
+    return daily_hours, start_hour_dist, date_str
+
+
+def month_stats_heatmap(starts, ends, durations, shift, year, month):
+    ndays = calendar.monthrange(year, month)[1]
+    first = day_index(datetime.date(year, month, 1))
+    offsets, seconds, _ = _select(starts, ends, durations, shift, first, first + ndays - 1)
+
+    totals = np.bincount(offsets, weights=seconds, minlength=ndays)
+    counts = np.bincount(offsets, minlength=ndays)
+    return {day + 1: totals[day] / 3600.0 for day in np.flatnonzero(counts).tolist()}
+
+
+def year_stats(starts, ends, durations, shift, year):
+    first = day_index(datetime.date(year, 1, 1))
+    last = day_index(datetime.date(year, 12, 31))
+    offsets, seconds, hours = _select(starts, ends, durations, shift, first, last)
+
+    # 一年内每个逻辑日属于哪个月 (0~11)
+    month_of_day = np.array([date_from_index(first + i).month - 1 for i in range(last - first + 1)])
+    months = month_of_day[offsets]
+    monthly_hours = (np.bincount(months, weights=seconds, minlength=12) / 3600.0).tolist()
+    worked_days = np.unique(offsets)
+    monthly_days = np.bincount(month_of_day[worked_days], minlength=12).tolist()
+    start_hour_dist = np.bincount(hours, minlength=24).tolist()
+    return monthly_hours, monthly_days, start_hour_dist
+
+
+# ===========================
+# 等价性检查
+# ===========================
+def _close(a, b):
+    """时长是浮点累加，求和顺序不同会有末位误差；条数/天数必须完全相同"""
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_close(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) <= 1e-9 * max(abs(a), abs(b), 1.0)
+    return a == b
+
+
+def check_equivalence(records=50_000, seed=0, day_offset=4):
+    """生成模拟数据，分别用纯 Python 和 NumPy 建统计，逐周/月/年比对，返回不一致的项 (空列表表示全部一致)"""
+    import os
+    import tempfile
+    from data_manager import DataManager
+    from test_gen import generate_mock_data
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="wl_agg_") as folder:
+        path = os.path.join(folder, "work_data.wlb")
+        generate_mock_data(path, records=records, seed=seed, sessions=(0, 12), cross_midnight=0.2, offset_edge=0.2,
+                           day_offset=day_offset, write_pointer=False)
+
+        # 作为脚本运行时本模块是 __main__，DataManager 导入的是另一个 aggregation 模块对象，
+        # 改这里的 USE_NUMPY 对它不起作用，所以直接用 vectorize 参数指定实现
+        reference = DataManager(data_file=path, recover_session=False, vectorize=False)
+        # 删掉刚写出的统计缓存，否则第二次载入会直接读缓存而不重新计算
+        reference.flush()
+        os.remove(reference.rollup_file)
+        vectorized = DataManager(data_file=path, recover_session=False, vectorize=True)
+        # 确认两边确实各自重新计算了，而不是读缓存或用了同一种实现
+        if reference.rollup_source != "python":
+            failures.append(f"reference built by {reference.rollup_source}")
+        if vectorized.rollup_source != "numpy":
+            failures.append(f"vectorized built by {vectorized.rollup_source}")
+
+        cols = columns(reference.store)
+        shift = day_offset * 3600
+        if not _close(daily_rollup(*cols, shift), reference._rollup):
+            failures.append("daily_rollup")
+        if list(vectorized._index_ids) != list(reference._index_ids):
+            failures.append("build_index")
+
+        first, last = reference.logical_date_range()
+        week = first - datetime.timedelta(days=first.weekday())
+        while week <= last:
+            if not _close(week_stats(*cols, shift, week), reference.get_week_stats(week)):
+                failures.append(f"week {week}")
+            week += datetime.timedelta(weeks=1)
+        for year in range(first.year, last.year + 1):
+            for month in range(1, 13):
+                if not _close(month_stats_heatmap(*cols, shift, year, month),
+                              reference.get_month_stats_heatmap(year, month)):
+                    failures.append(f"month {year}-{month:02d}")
+            if not _close(year_stats(*cols, shift, year), reference.get_year_stats(year)):
+                failures.append(f"year {year}")
+            if not _close(vectorized.get_year_stats(year), reference.get_year_stats(year)):
+                failures.append(f"DataManager year {year}")
+        reference.close()
+        vectorized.close()
+    return failures
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="纯 Python 与 NumPy 统计实现的等价性检查")
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--day-offset", type=int, default=4)
+    args = parser.parse_args()
+    if not HAVE_NUMPY:
+        print("未安装 NumPy，跳过")
+        sys.exit(0)
+
+    failures = check_equivalence(args.records, args.seed, args.day_offset)
+    if failures:
+        print(f"[失败] {len(failures)} 项不一致: {', '.join(failures[:20])}")
+        sys.exit(1)
+    print(f"[成功] {args.records} 条记录，纯 Python 与 NumPy 实现结果一致")
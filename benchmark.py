@@ -0,0 +1,230 @@
+"""
+性能基准：生成 1万/10万/100万 条规模的模拟历史记录，测量数据加载、保存、统计查询和图表渲染耗时
+结果以 JSON 输出，便于在不同提交之间比较
+
+用法:
+    python benchmark.py                                  # 默认 1万/10万/100万 条，JSON 格式
+    python benchmark.py --sizes 10000 --formats json wlb db --output bench.json
+    python benchmark.py --sizes 10000 --compare bench.json   # 和之前的结果对比
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import data_manager
+import test_gen
+from data_manager import DataManager, LOCAL_POINTER_FILE
+
+FORMAT_EXTENSIONS = {"json": ".json", "wlb": ".wlb", "db": ".db"}
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# 基准数据每天 3~5 条 (平均 4 条)，含跨零点和分界点附近的记录
+SESSIONS_PER_DAY = (3, 5)
+
+# ===========================
+# 模拟数据
+# ===========================
+def write_fixture(path, n, seed):
+    """用 test_gen 的生成器写 n 条到今天为止的记录 (同一个种子每次生成相同的数据)"""
+    test_gen.generate_mock_data(path, records=n, seed=seed, sessions=SESSIONS_PER_DAY, day_offset=4,
+                                write_pointer=False)
+
+
+# ===========================
+# 计时
+# ===========================
+def measure(fn, rounds, setup=None):
+    """运行 rounds 次，返回毫秒统计；setup 在每次计时前调用，不计入耗时"""
+    times = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        "rounds": rounds,
+        "mean_ms": statistics.fmean(times),
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, size, fmt, stats):
+        self.results.append(dict(name=name, size=size, format=fmt, **stats))
+        print(f"  {name:<28} {stats['median_ms']:>10.2f} ms  (min {stats['min_ms']:.2f}, {stats['rounds']} 次)")
+
+
+# ===========================
+# 各项测试
+# ===========================
+def bench_data(rec, size, fmt, rounds):
+    path = os.path.abspath("work_data" + FORMAT_EXTENSIONS[fmt])
+    with open(LOCAL_POINTER_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"data_path": path}, f)
+
+    t0 = time.perf_counter()
+    write_fixture(path, size, seed=size)
+    print(f"  (生成数据 {(time.perf_counter() - t0):.1f} s, {os.path.getsize(path) / 1e6:.1f} MB)")
+
+    rollup = os.path.splitext(path)[0] + data_manager.ROLLUP_SUFFIX
+
+    def drop_rollup():
+        if os.path.exists(rollup):
+            os.remove(rollup)
+
+    def load():
+        dm = DataManager()
+        dm.close()
+
+    rec.add("load_cold", size, fmt, measure(load, rounds, setup=drop_rollup))
+    load()  # 写出统计缓存
+    rec.add("load_warm", size, fmt, measure(load, rounds))
+
+    dm = DataManager()
+    today = datetime.date.today()
+    rec.add("get_today_total_seconds", size, fmt, measure(dm.get_today_total_seconds, rounds * 20))
+    rec.add("get_week_stats", size, fmt, measure(lambda: dm.get_week_stats(today), rounds * 20))
+    rec.add("get_month_stats_heatmap", size, fmt,
+            measure(lambda: dm.get_month_stats_heatmap(today.year, today.month), rounds * 20))
+    rec.add("get_year_stats", size, fmt, measure(lambda: dm.get_year_stats(today.year), rounds * 20))
+    rec.add("get_hourly_occupancy", size, fmt, measure(lambda: dm.get_hourly_occupancy(today.year), rounds * 20))
+
+    # 保存：每次追加一条一小时后的新记录 (JSON 格式会周期性触发后台合并)
+    clock = [datetime.datetime.now() + datetime.timedelta(days=1)]
+
+    def save():
+        start = clock[0]
+        clock[0] += datetime.timedelta(hours=1)
+        dm.save_record(start, start + datetime.timedelta(minutes=30))
+
+    rec.add("save_record", size, fmt, measure(save, rounds * 50))
+    rec.add("flush_after_saves", size, fmt, measure(dm.flush, 1))
+    return dm
+
+
+def bench_charts(rec, dm, size, fmt, rounds):
+    """用 Agg 离屏渲染报表的三种图表：首次完整绘制 + 翻页 (原地更新/blit)"""
+    import chart_engine
+    chart_engine.use_headless()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    today = datetime.date.today()
+    weeks = [today - datetime.timedelta(weeks=i) for i in range(rounds * 5)]
+    months = [chart_engine.shift_month(today.replace(day=1), -i) for i in range(rounds * 5)]
+    years = [today.year - i for i in range(rounds * 5)]
+    cases = [
+        ("week", chart_engine.WeekChart, lambda i: dm.get_week_stats(weeks[i])[:2]),
+        ("month", chart_engine.MonthChart,
+         lambda i: (months[i].year, months[i].month, dm.get_month_stats_heatmap(months[i].year, months[i].month))),
+        ("year", chart_engine.YearChart, lambda i: (years[i],) + tuple(dm.get_year_stats(years[i]))),
+        ("occupancy", chart_engine.OccupancyChart, lambda i: (years[i], dm.get_hourly_occupancy(years[i]))),
+    ]
+    for view, cls, args_for in cases:
+        data = [args_for(i) for i in range(len(weeks))]
+
+        def full_draw():
+            fig = Figure(figsize=(8, 6), dpi=100)
+            FigureCanvasAgg(fig)
+            chart = cls(fig)
+            chart.update(*data[0])
+            fig.canvas.draw()
+            return chart
+
+        rec.add(f"render_{view}_first", size, fmt, measure(full_draw, rounds))
+
+        chart = full_draw()
+        step = iter(range(1, len(data)))
+
+        def navigate():
+            chart.update(*data[next(step)])
+            chart.render()
+
+        rec.add(f"render_{view}_navigate", size, fmt, measure(navigate, len(data) - 1))
+
+
+# ===========================
+# 结果输出
+# ===========================
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r["name"], r["size"], r["format"]): r for r in baseline["results"]}
+    print(f"\n与 {baseline_path} ({baseline['environment'].get('commit', '?')}) 对比 (中位数):")
+    for r in results:
+        o = old.get((r["name"], r["size"], r["format"]))
+        if o and o["median_ms"] > 0:
+            ratio = r["median_ms"] / o["median_ms"]
+            flag = "  <-- 变慢" if ratio > 1.2 else ""
+            print(f"  {r['format']:<5}{r['size']:>9}  {r['name']:<28} {o['median_ms']:>10.2f} -> "
+                  f"{r['median_ms']:>10.2f} ms  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WorkLogger 性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="记录条数")
+    parser.add_argument("--formats", nargs="+", default=["json"], choices=sorted(FORMAT_EXTENSIONS))
+    parser.add_argument("--rounds", type=int, default=3, help="每项重复次数 (查询/保存按比例放大)")
+    parser.add_argument("--no-charts", action="store_true", help="跳过图表渲染")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果 JSON 文件")
+    parser.add_argument("--compare", help="和之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+
+    # 所有文件都放在临时目录里，不碰当前目录的 pathCfg.json 和数据文件
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    rec = Recorder()
+    origin = os.getcwd()
+    for fmt in args.formats:
+        for size in args.sizes:
+            print(f"[{fmt}] {size} 条记录")
+            workdir = tempfile.mkdtemp(prefix="wl_bench_")
+            os.chdir(workdir)
+            try:
+                dm = bench_data(rec, size, fmt, args.rounds)
+                try:
+                    if not args.no_charts:
+                        bench_charts(rec, dm, size, fmt, args.rounds)
+                finally:
+                    dm.close()
+            finally:
+                os.chdir(origin)
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"environment": environment(), "results": rec.results}
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已写入: {output}")
+    if baseline:
+        compare(rec.results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,347 @@ import tkinter as tk
 from tkinter import ttk
 import datetime
 import calendar
-import matplotlib.pyplot as plt
+import math
+import queue
+import threading
+from collections import OrderedDict
+import matplotlib
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import numpy as np
+from matplotlib.patches import Rectangle
+
+from profiler import span, timed
+
+# ==========================================
+# 全局绘图设置 (不经过 pyplot，省掉它的导入和后端选择)
+# ==========================================
+matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
+matplotlib.rcParams['axes.unicode_minus'] = False
+matplotlib.rcParams['font.size'] = 9
+
+
+def use_headless():
+    """离屏绘制 (批量导出、基准测试)：切到 Agg 后端，并屏蔽缺少中文字体时的缺字警告 (只是缺字，不影响结果)"""
+    import logging
+    import warnings
+    matplotlib.use("Agg")
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+# 预取结果回到 Tk 主线程的轮询间隔 (毫秒)
+PREFETCH_POLL_MS = 50
+
+def shift_month(d, offset):
+    """把某月1号前后移动 offset 个月"""
+    y, m = divmod(d.year * 12 + d.month - 1 + offset, 12)
+    return datetime.date(y, m + 1, 1)
+
+def neighbour_anchors(view, anchor):
+    """某个视图锚点的前一个和后一个周期"""
+    if view == "week":
+        return [anchor - datetime.timedelta(weeks=1), anchor + datetime.timedelta(weeks=1)]
+    if view == "month":
+        return [shift_month(anchor, -1), shift_month(anchor, 1)]
+    return [anchor.replace(year=anchor.year - 1), anchor.replace(year=anchor.year + 1)]
+
+class StatsCache:
+    """
+    报表数据的 LRU 缓存
+    key = (视图, 锚点, day_offset_hour, 数据版本)，保存记录或修改设置后版本号变化，旧结果自动失效
+    """
+    def __init__(self, db_handler, maxsize=64):
+        self.db = db_handler
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._version = db_handler.data_version
+
+    def key_for(self, view, anchor):
+        version = self.db.data_version
+        if version != self._version:
+            # 数据已变化，旧版本的结果不可能再命中，直接清掉
+            self._data.clear()
+            self._version = version
+        return (view, anchor, self.db.get_setting("day_offset_hour", 4), version)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, view, anchor):
+        """view: 'week' / 'month' / 'year' / 'occupancy'；anchor: 对应视图的锚点日期"""
+        key = self.key_for(view, anchor)
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+        self.misses += 1
+        result = self.compute(view, anchor)
+        self.put(key, result)
+        return result
+
+    def put(self, key, result):
+        """放入一条结果 (后台预取算出来的也走这里)，版本已过期的直接丢弃"""
+        if key[3] != self.db.data_version:
+            return
+        self._data[key] = result
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def compute(self, view, anchor):
+        """直接查询 DataManager，不经过缓存 (可在后台线程调用)"""
+        if view == "week":
+            return self.db.get_week_stats(anchor)
+        if view == "month":
+            return self.db.get_month_stats_heatmap(anchor.year, anchor.month)
+        if view == "year":
+            return self.db.get_year_stats(anchor.year)
+        if view == "occupancy":
+            return self.db.get_hourly_occupancy(anchor.year)
+        raise ValueError(f"未知的报表视图: {view}")
+
+    def info(self):
+        """命中/未命中统计，便于排查"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
 
 # ==========================================
-# 全局绘图设置
+# 图表：artist 只创建一次，翻页时原地更新
 # ==========================================
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
-plt.rcParams['axes.unicode_minus'] = False
-plt.rcParams['font.size'] = 9
+WEEKDAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+MONTH_NAMES = [f"{i}月" for i in range(1, 13)]
+HOURS_X = list(range(24))
+
+NICE_STEPS = (1, 1.5, 2, 3, 4, 5, 6, 8, 10)
+
+def nice_ylim(peak, headroom=1.2):
+    """纵轴上限取到 1/1.5/2/3/4/5/6/8 x 10^k：数据小幅变化时坐标轴保持不变，翻页可以直接 blit"""
+    target = max(peak, 1) * headroom
+    scale = 10 ** math.floor(math.log10(target))
+    return next(step * scale for step in NICE_STEPS if step * scale >= target)
+
+def make_bar_labels(ax, bars, **kwargs):
+    """代替 bar_label：每根柱子上方一个文字，之后只改位置和内容"""
+    return [ax.annotate("", (bar.get_x() + bar.get_width() / 2, 0), xytext=(0, 2),
+                        textcoords="offset points", ha='center', va='bottom', **kwargs)
+            for bar in bars]
+
+def set_bars(bars, labels, values, fmt):
+    for bar, label, v in zip(bars, labels, values):
+        bar.set_height(v)
+        label.xy = (label.xy[0], v)
+        label.set_text(fmt(v))
+
+
+class BlitChart:
+    """
+    图表基类：子类在 _build 里创建全部 artist，update 只修改高度/颜色/文字
+    坐标轴范围和画布尺寸没变时，在缓存的背景上只重画变化的 artist 再 blit；否则整体 draw_idle
+    use_blit=False 用于离屏导出 (savefig 不会画 animated 的 artist)
+    """
+    def __init__(self, fig, use_blit=True):
+        self.fig = fig
+        self.use_blit = use_blit
+        self._dynamic = []      # 随数据变化的 artist
+        self._background = None
+        self._background_key = None
+        self._build()
+        if use_blit:
+            # 坐标轴边框原本画在柱子上面，也放进动态层才能保持层次
+            for ax in fig.axes:
+                if ax.axison:
+                    self._dynamic += ax.spines.values()
+            # 按完整重绘时的顺序排列：先按所属坐标轴，再按 zorder
+            self._dynamic.sort(key=lambda a: (fig.axes.index(a.axes), a.get_zorder()))
+            for artist in self._dynamic:
+                artist.set_animated(True)
+            fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _layout_key(self):
+        return tuple(ax.get_ylim() for ax in self.fig.axes) + (tuple(self.fig.bbox.bounds),)
+
+    def _on_draw(self, event):
+        """完整重绘之后：保存不含动态 artist 的背景，再把动态 artist 画上去"""
+        self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._background_key = self._layout_key()
+        self._draw_dynamic()
+
+    def _draw_dynamic(self):
+        for artist in self._dynamic:
+            if artist.get_visible():
+                self.fig.draw_artist(artist)
+
+    def render(self):
+        """把 update 的结果显示出来"""
+        canvas = self.fig.canvas
+        if not self.use_blit or self._background is None or self._layout_key() != self._background_key:
+            canvas.draw_idle()
+            return
+        with span("render.blit"):
+            canvas.restore_region(self._background)
+            self._draw_dynamic()
+            canvas.blit(self.fig.bbox)
+
+
+class WeekChart(BlitChart):
+    """周报表：每日时长 + 开始时间分布"""
+    def _build(self):
+        self.fig.subplots_adjust(hspace=0.4, top=0.9, bottom=0.1)
+        ax1 = self.ax_daily = self.fig.add_subplot(211)
+        ax2 = self.ax_hourly = self.fig.add_subplot(212)
+
+        # 上图：每日时长
+        self.daily_bars = ax1.bar(WEEKDAY_NAMES, [0] * 7, color='#5D9CEC', width=0.6)
+        self.daily_labels = make_bar_labels(ax1, self.daily_bars)
+        ax1.set_title("本周每日工作时长", fontsize=11)
+        ax1.set_ylabel("小时")
+
+        # 下图：开始时间分布，x轴标签隔一个显示一个，防止拥挤
+        self.hourly_bars = ax2.bar(HOURS_X, [0] * 24, color='#FFB86C', width=0.8)
+        self.hourly_labels = make_bar_labels(ax2, self.hourly_bars)
+        ax2.set_title("本周工作开始时间点分布", fontsize=11)
+        ax2.set_xticks(HOURS_X)
+        ax2.set_xticklabels([f"{h}" if h % 2 == 0 else "" for h in HOURS_X], fontsize=8)
+
+        self._dynamic += list(self.daily_bars) + self.daily_labels
+        self._dynamic += list(self.hourly_bars) + self.hourly_labels
+
+    def update(self, daily_hours, start_dist):
+        set_bars(self.daily_bars, self.daily_labels, daily_hours, lambda v: f"{v:.1f} h")
+        # 只显示非0的标签
+        set_bars(self.hourly_bars, self.hourly_labels, start_dist, lambda v: str(v) if v > 0 else '')
+        self.ax_daily.set_ylim(0, nice_ylim(max(daily_hours)))
+        self.ax_hourly.set_ylim(0, nice_ylim(max(start_dist), 1.15))
+
+
+class MonthChart(BlitChart):
+    """月度日历热力图：6 行 x 7 列的格子预先建好，按月份显示/隐藏"""
+    def _build(self):
+        ax = self.ax = self.fig.add_subplot(111)
+        ax.set_axis_off()
+        ax.set_xlim(-0.5, 6.5); ax.set_ylim(0, 8)
+
+        for i, w in enumerate(["一", "二", "三", "四", "五", "六", "日"]):
+            ax.text(i, 7, w, ha='center', va='center', weight='bold', color='#555')
+
+        self.cells = []  # (格子, 日期文字, 时长文字)
+        for r_idx in range(6):
+            y_pos = 6 - r_idx
+            for c_idx in range(7):
+                rect = ax.add_patch(Rectangle((c_idx-0.45, y_pos-0.45), 0.9, 0.9, color='#F5F5F5'))
+                day_txt = ax.text(c_idx-0.35, y_pos+0.3, "", fontsize=9)
+                hours_txt = ax.text(c_idx, y_pos-0.1, "", ha='center', va='center',
+                                    fontsize=10, weight='bold')
+                self.cells.append((rect, day_txt, hours_txt))
+                self._dynamic += [rect, day_txt, hours_txt]
+
+    def update(self, year, month, data_map):
+        days = [day for week in calendar.monthcalendar(year, month) for day in week]
+        days += [0] * (len(self.cells) - len(days))
+        for (rect, day_txt, hours_txt), day in zip(self.cells, days):
+            visible = day != 0
+            for artist in (rect, day_txt, hours_txt):
+                artist.set_visible(visible)
+            if not visible:
+                continue
+
+            hours = data_map.get(day, 0)
+            if hours == 0:
+                bg_color = '#F5F5F5'; txt_color = '#BBB'
+            elif hours < 4:
+                bg_color = '#C8E6C9'; txt_color = '#000'
+            else:
+                bg_color = '#4CAF50'; txt_color = '#FFF'
+
+            rect.set_color(bg_color)
+            day_txt.set_text(str(day)); day_txt.set_color(txt_color)
+            hours_txt.set_text(f"{hours:.1f}h" if hours > 0 else "")
+            hours_txt.set_color(txt_color)
+
+
+class YearChart(BlitChart):
+    """年报表：月度时长/天数双轴对比 + 全年开始时间分布"""
+    def _build(self):
+        self.fig.subplots_adjust(hspace=0.4, top=0.9, bottom=0.1)
+        # 双轴只在这里创建一次
+        ax_hours = self.ax_hours = self.fig.add_subplot(211)  # 左轴
+        ax_days = self.ax_days = ax_hours.twinx()             # 右轴
+        ax_dist = self.ax_dist = self.fig.add_subplot(212)    # 下方子图
+        x = range(12)
+        width = 0.35
+
+        self.hours_bars = ax_hours.bar([i - width/2 for i in x], [0] * 12, width, label='总时长(h)', color='#4FC3F7')
+        self.hours_labels = make_bar_labels(ax_hours, self.hours_bars, color='#0277BD', fontsize=8)
+        ax_hours.set_ylabel('总时长 (小时)', color='#0277BD')
+        ax_hours.tick_params(axis='y', labelcolor='#0277BD')
+        ax_hours.set_xticks(list(x))
+        ax_hours.set_xticklabels(MONTH_NAMES)
+        ax_hours.set_title("")
+
+        self.days_bars = ax_days.bar([i + width/2 for i in x], [0] * 12, width, label='工作天数(d)', color='#FF9800')
+        self.days_labels = make_bar_labels(ax_days, self.days_bars, color='#EF6C00', fontsize=8)
+        ax_days.set_ylabel('出勤天数 (天)', color='#EF6C00')
+        ax_days.tick_params(axis='y', labelcolor='#EF6C00')
+        ax_days.set_ylim(0, 32)
+
+        self.dist_bars = ax_dist.bar(HOURS_X, [0] * 24, color='#9575CD', width=0.8)
+        self.dist_labels = make_bar_labels(ax_dist, self.dist_bars)
+        ax_dist.set_title("", fontsize=11)
+        ax_dist.set_xticks(HOURS_X)
+        ax_dist.set_xticklabels([str(h) if h % 2 == 0 else "" for h in HOURS_X], fontsize=8)
+
+        self._dynamic += [ax_hours.title, ax_dist.title]
+        self._dynamic += list(self.hours_bars) + list(self.days_bars) + list(self.dist_bars)
+        self._dynamic += self.hours_labels + self.days_labels + self.dist_labels
+
+    def update(self, year, m_hours, m_days, start_dist):
+        self.ax_hours.title.set_text(f"{year}年 月度效率对比 (时长 vs 天数)")
+        self.ax_dist.title.set_text(f"{year}年 全年工作习惯")
+        set_bars(self.hours_bars, self.hours_labels, m_hours, lambda v: f"{v:.0f}")
+        set_bars(self.days_bars, self.days_labels, m_days, lambda v: f"{v:d}")
+        set_bars(self.dist_bars, self.dist_labels, start_dist, lambda v: str(v) if v > 0 else '')
+        self.ax_hours.set_ylim(0, nice_ylim(max(m_hours), 1.1))
+        self.ax_dist.set_ylim(0, nice_ylim(max(start_dist), 1.15))
+
+
+class OccupancyChart(BlitChart):
+    """时段热力图：7 x 24 格，颜色和数字都是该时段累计的工作小时数 (按时长加权，不是开始次数)"""
+    def _build(self):
+        self.fig.subplots_adjust(left=0.08, right=0.98, top=0.9, bottom=0.12)
+        ax = self.ax = self.fig.add_subplot(111)
+        self.image = ax.imshow([[0.0] * 24 for _ in range(7)], cmap='YlOrRd', vmin=0, vmax=1,
+                               aspect='auto', interpolation='nearest')
+        ax.set_xticks(HOURS_X)
+        ax.set_xticklabels([f"{h}" for h in HOURS_X], fontsize=8)
+        ax.set_yticks(range(7))
+        ax.set_yticklabels(WEEKDAY_NAMES)
+        ax.set_xlabel("钟点 (按逻辑日期归属星期)")
+        ax.set_title("")
+        self.cell_labels = [[ax.text(h, d, "", ha='center', va='center', fontsize=7) for h in HOURS_X]
+                            for d in range(7)]
+
+        self._dynamic += [self.image, ax.title]
+        self._dynamic += [txt for row in self.cell_labels for txt in row]
+
+    def _layout_key(self):
+        # 色阶上限变了，格子里文字的深浅也要跟着重新判断，走一次完整重绘
+        return super()._layout_key() + (self.image.get_clim(),)
+
+    def update(self, year, matrix):
+        self.ax.title.set_text(f"{year}年 各时段工作时长分布 (小时)")
+        peak = nice_ylim(max(max(row) for row in matrix), 1.0)
+        self.image.set_data(matrix)
+        self.image.set_clim(0, peak)
+        for row, labels in zip(matrix, self.cell_labels):
+            for v, txt in zip(row, labels):
+                txt.set_text("" if v < 0.05 else f"{v:.1f}" if v < 10 else f"{v:.0f}")
+                txt.set_color('#FFF' if v > peak * 0.6 else '#333')
+
 
 class ReportWindow(tk.Toplevel):
     def __init__(self, parent, db_handler):
@@ -20,6 +350,8 @@ class ReportWindow(tk.Toplevel):
         self.title("工作效能分析报表 (V1.0)")
         self.geometry("1000x800")
         self.db = db_handler
+        # 已经看过的周/月/年直接从缓存取数据
+        self.stats_cache = StatsCache(db_handler)
         
         # --- 修复核心：状态解耦 ---
         today = datetime.date.today()
@@ -29,8 +361,24 @@ class ReportWindow(tk.Toplevel):
         self.view_month_date = today.replace(day=1)
         # 3. 年视图状态：锚定到今年1月1号
         self.view_year_date = today.replace(month=1, day=1)
+        # 4. 时段热力图：同样按年翻页
+        self.view_occupancy_date = today.replace(month=1, day=1)
 
+        self._start_prefetcher()
         self._setup_ui()
+        # 关闭时只隐藏，下次打开直接复用图表和缓存
+        self.protocol("WM_DELETE_WINDOW", self.hide)
+
+    def hide(self):
+        """隐藏窗口 (不会触发 <Destroy>)，排队中的预取一并作废"""
+        self._prefetch_gen += 1
+        self.withdraw()
+
+    def show(self):
+        """重新显示隐藏的报表窗口，数据版本变化过才重画当前页"""
+        self.deiconify()
+        self.lift()
+        self._on_tab_changed()
 
     def _setup_ui(self):
         self.notebook = ttk.Notebook(self)
@@ -40,14 +388,47 @@ class ReportWindow(tk.Toplevel):
         self.tab_week = ttk.Frame(self.notebook)
         self.tab_month = ttk.Frame(self.notebook)
         self.tab_year = ttk.Frame(self.notebook)
+        self.tab_occupancy = ttk.Frame(self.notebook)
 
         self.notebook.add(self.tab_week, text='📊 周工作统计')
         self.notebook.add(self.tab_month, text='📅 月度日历')
         self.notebook.add(self.tab_year, text='📈 年度概览')
-
-        self._init_week_tab()
-        self._init_month_tab()
-        self._init_year_tab()
+        self.notebook.add(self.tab_occupancy, text='🔥 时段热力图')
+
+        # 各页的图表在第一次切换到该页时才创建和绘制
+        self._tab_builders = {
+            str(self.tab_week): self._init_week_tab,
+            str(self.tab_month): self._init_month_tab,
+            str(self.tab_year): self._init_year_tab,
+            str(self.tab_occupancy): self._init_occupancy_tab,
+        }
+        self._tab_updaters = {
+            str(self.tab_week): self._update_week_chart,
+            str(self.tab_month): self._update_month_chart,
+            str(self.tab_year): self._update_year_chart,
+            str(self.tab_occupancy): self._update_occupancy_chart,
+        }
+        # 每页最后一次绘制时的数据版本
+        self._drawn_versions = {}
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        self._on_tab_changed()
+
+    def _attach_canvas(self, fig, master):
+        canvas = FigureCanvasTkAgg(fig, master=master)
+        # draw_idle 最终调用的也是实例上的 draw，包装之后每次完整重绘都会计时
+        canvas.draw = timed("render.draw")(canvas.draw)
+        canvas.get_tk_widget().pack(fill='both', expand=True)
+        return canvas
+
+    def _on_tab_changed(self, event=None):
+        tab = self.notebook.select()
+        builder = self._tab_builders.pop(tab, None)
+        if builder:
+            builder()
+        elif self._drawn_versions.get(tab) != self.db.data_version:
+            # 上次画完之后保存过记录或改过设置
+            self._tab_updaters[tab]()
+        self._drawn_versions[tab] = self.db.data_version
 
     # =========================================================================
     # 1. 周报表
@@ -75,14 +456,10 @@ class ReportWindow(tk.Toplevel):
         # [右侧] 下一周按钮
         ttk.Button(ctrl_frame, text="下一周 >>", command=lambda: self._change_week(1)).pack(side='right', padx=10)
 
-        # 绘图初始化 (保持不变)
+        # 绘图初始化：先挂上画布，图表再在其上注册重绘回调
         self.fig_week = Figure(figsize=(8, 6), dpi=100)
-        self.fig_week.subplots_adjust(hspace=0.4, top=0.9, bottom=0.1)
-        self.ax_week_daily = self.fig_week.add_subplot(211)
-        self.ax_week_hourly = self.fig_week.add_subplot(212)
-
-        self.canvas_week = FigureCanvasTkAgg(self.fig_week, master=self.tab_week)
-        self.canvas_week.get_tk_widget().pack(fill='both', expand=True)
+        self.canvas_week = self._attach_canvas(self.fig_week, self.tab_week)
+        self.week_chart = WeekChart(self.fig_week)
         
         self._update_week_chart()
 
@@ -90,9 +467,10 @@ class ReportWindow(tk.Toplevel):
         self.view_week_date += datetime.timedelta(weeks=offset)
         self._update_week_chart()
 
+    @timed("report.week")
     def _update_week_chart(self):
         # 获取数据
-        daily_hours, start_dist, date_str = self.db.get_week_stats(self.view_week_date)
+        daily_hours, start_dist, date_str = self.stats_cache.get("week", self.view_week_date)
         
         # === 新增：计算总时长 ===
         total_week_hours = sum(daily_hours)
@@ -101,32 +479,9 @@ class ReportWindow(tk.Toplevel):
         self.lbl_week_range.config(text=date_str)
         self.lbl_week_total.config(text=f"本周总计投入: {total_week_hours:.1f} 小时")
 
-        # --- 以下绘图逻辑保持不变 ---
-        
-        # 上图：每日时长
-        ax1 = self.ax_week_daily
-        ax1.clear()
-        days = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        bars = ax1.bar(days, daily_hours, color='#5D9CEC', width=0.6)
-        ax1.bar_label(bars, fmt='%.1f h', padding=2)
-        ax1.set_title("本周每日工作时长", fontsize=11)
-        ax1.set_ylabel("小时")
-        # 动态调整Y轴上限，稍微留点空隙
-        ax1.set_ylim(0, max(max(daily_hours), 1) * 1.2)
-
-        # 下图：开始时间分布
-        ax2 = self.ax_week_hourly
-        ax2.clear()
-        hours_x = list(range(24))
-        bars2 = ax2.bar(hours_x, start_dist, color='#FFB86C', width=0.8)
-        # 只显示非0的标签
-        ax2.bar_label(bars2, fmt='%d', padding=2, labels=[str(x) if x>0 else '' for x in start_dist])
-        ax2.set_title("本周工作开始时间点分布", fontsize=11)
-        ax2.set_xticks(hours_x)
-        # x轴标签隔一个显示一个，防止拥挤
-        ax2.set_xticklabels([f"{h}" if h%2==0 else "" for h in hours_x], fontsize=8)
-        
-        self.canvas_week.draw()
+        self.week_chart.update(daily_hours, start_dist)
+        self.week_chart.render()
+        self._prefetch_neighbours("week", self.view_week_date)
 
     # =========================================================================
     # 2. 月报表
@@ -140,61 +495,25 @@ class ReportWindow(tk.Toplevel):
         ttk.Button(ctrl_frame, text="下一月 >>", command=lambda: self._change_month(1)).pack(side='right', padx=10)
 
         self.fig_month = Figure(figsize=(8, 6), dpi=100)
-        self.ax_month = self.fig_month.add_subplot(111)
-        self.canvas_month = FigureCanvasTkAgg(self.fig_month, master=self.tab_month)
-        self.canvas_month.get_tk_widget().pack(fill='both', expand=True)
+        self.canvas_month = self._attach_canvas(self.fig_month, self.tab_month)
+        self.month_chart = MonthChart(self.fig_month)
 
         self._update_month_chart()
 
     def _change_month(self, offset):
         # 使用独立的 view_month_date
-        y = self.view_month_date.year
-        m = self.view_month_date.month + offset
-        if m > 12:
-            y += 1; m = 1
-        elif m < 1:
-            y -= 1; m = 12
-        self.view_month_date = datetime.date(y, m, 1)
+        self.view_month_date = shift_month(self.view_month_date, offset)
         self._update_month_chart()
 
+    @timed("report.month")
     def _update_month_chart(self):
         year, month = self.view_month_date.year, self.view_month_date.month
         self.lbl_month_title.config(text=f"{year}年 {month}月 工作概览")
 
-        data_map = self.db.get_month_stats_heatmap(year, month)
-        cal = calendar.monthcalendar(year, month)
-
-        ax = self.ax_month
-        ax.clear()
-        ax.set_axis_off()
-
-        weekdays = ["一", "二", "三", "四", "五", "六", "日"]
-        for i, w in enumerate(weekdays):
-            ax.text(i, 7, w, ha='center', va='center', weight='bold', color='#555')
-
-        for r_idx, week in enumerate(cal):
-            y_pos = 6 - r_idx
-            for c_idx, day in enumerate(week):
-                if day == 0: continue
-                
-                hours = data_map.get(day, 0)
-                if hours == 0:
-                    bg_color = '#F5F5F5'; txt_color = '#BBB'
-                elif hours < 4:
-                    bg_color = '#C8E6C9'; txt_color = '#000'
-                else:
-                    bg_color = '#4CAF50'; txt_color = '#FFF'
-
-                rect = plt.Rectangle((c_idx-0.45, y_pos-0.45), 0.9, 0.9, color=bg_color, ec='#DDD')
-                ax.add_patch(rect)
-                ax.text(c_idx-0.35, y_pos+0.3, str(day), fontsize=9, color=txt_color)
-                
-                if hours > 0:
-                    ax.text(c_idx, y_pos-0.1, f"{hours:.1f}h", ha='center', va='center', 
-                            fontsize=10, weight='bold', color=txt_color)
-
-        ax.set_xlim(-0.5, 6.5); ax.set_ylim(0, 8)
-        self.canvas_month.draw()
+        data_map = self.stats_cache.get("month", self.view_month_date)
+        self.month_chart.update(year, month, data_map)
+        self.month_chart.render()
+        self._prefetch_neighbours("month", self.view_month_date)
 
     # =========================================================================
     # 3. 年报表 (修复双轴Ghosting问题)
@@ -208,16 +527,9 @@ class ReportWindow(tk.Toplevel):
         ttk.Button(ctrl_frame, text="下一年 >>", command=lambda: self._change_year(1)).pack(side='right', padx=10)
 
         self.fig_year = Figure(figsize=(8, 6), dpi=100)
-        self.fig_year.subplots_adjust(hspace=0.4, top=0.9, bottom=0.1)
-        
-        # --- 修复核心：初始化时创建双轴，而不是在update里创建 ---
-        self.ax_year_hours = self.fig_year.add_subplot(211) # 左轴
-        self.ax_year_days = self.ax_year_hours.twinx()    # 右轴 (只创建这一次!)
-        
-        self.ax_year_dist = self.fig_year.add_subplot(212)  # 下方子图
-
-        self.canvas_year = FigureCanvasTkAgg(self.fig_year, master=self.tab_year)
-        self.canvas_year.get_tk_widget().pack(fill='both', expand=True)
+        self.canvas_year = self._attach_canvas(self.fig_year, self.tab_year)
+        # 双轴在图表初始化时创建，而不是在update里创建
+        self.year_chart = YearChart(self.fig_year)
         
         self._update_year_chart()
 
@@ -227,49 +539,109 @@ class ReportWindow(tk.Toplevel):
         self.view_year_date = self.view_year_date.replace(year=y)
         self._update_year_chart()
 
+    @timed("report.year")
     def _update_year_chart(self):
         year = self.view_year_date.year
         self.lbl_year_title.config(text=f"{year} 年度工作总结")
         
-        m_hours, m_days, start_dist = self.db.get_year_stats(year)
-        months = [f"{i}月" for i in range(1, 13)]
-        x = np.arange(len(months))
-        width = 0.35
+        m_hours, m_days, start_dist = self.stats_cache.get("year", self.view_year_date)
+        self.year_chart.update(year, m_hours, m_days, start_dist)
+        self.year_chart.render()
+        self._prefetch_neighbours("year", self.view_year_date)
 
-        # --- 上图：更新数据而不是新建轴 ---
-        
-        # 1. 清空当前内容
-        self.ax_year_hours.clear()
-        self.ax_year_days.clear()
-
-        # 2. 重新绘制左轴 (总时长)
-        bars1 = self.ax_year_hours.bar(x - width/2, m_hours, width, label='总时长(h)', color='#4FC3F7')
-        self.ax_year_hours.set_ylabel('总时长 (小时)', color='#0277BD')
-        self.ax_year_hours.tick_params(axis='y', labelcolor='#0277BD')
-        self.ax_year_hours.bar_label(bars1, fmt='%.0f', padding=2, color='#0277BD', fontsize=8)
-        
-        # 设置X轴 (只需要在主轴设置一次)
-        self.ax_year_hours.set_xticks(x)
-        self.ax_year_hours.set_xticklabels(months)
-        self.ax_year_hours.set_title(f"{year}年 月度效率对比 (时长 vs 天数)")
-
-        # 3. 重新绘制右轴 (天数)
-        bars2 = self.ax_year_days.bar(x + width/2, m_days, width, label='工作天数(d)', color='#FF9800')
-        self.ax_year_days.set_ylabel('出勤天数 (天)', color='#EF6C00')
-        self.ax_year_days.tick_params(axis='y', labelcolor='#EF6C00')
-        self.ax_year_days.set_ylim(0, 32)
-        self.ax_year_days.bar_label(bars2, fmt='%d', padding=2, color='#EF6C00', fontsize=8)
-
-        # --- 下图：分布 ---
-        self.ax_year_dist.clear()
-        hours_x = list(range(24))
-        bars3 = self.ax_year_dist.bar(hours_x, start_dist, color='#9575CD', width=0.8)
-        self.ax_year_dist.bar_label(bars3, fmt='%d', padding=2, labels=[str(x) if x>0 else '' for x in start_dist])
-        self.ax_year_dist.set_title(f"{year}年 全年工作习惯", fontsize=11)
-        self.ax_year_dist.set_xticks(hours_x)
-        self.ax_year_dist.set_xticklabels([str(h) if h%2==0 else "" for h in hours_x], fontsize=8)
-
-        self.canvas_year.draw()
+    # =========================================================================
+    # 4. 时段热力图 (每段工作按覆盖的小时格加权)
+    # =========================================================================
+    def _init_occupancy_tab(self):
+        ctrl_frame = ttk.Frame(self.tab_occupancy)
+        ctrl_frame.pack(fill='x', pady=5)
+        ttk.Button(ctrl_frame, text="<< 上一年", command=lambda: self._change_occupancy_year(-1)).pack(side='left', padx=10)
+        self.lbl_occupancy_title = ttk.Label(ctrl_frame, text="Loading...", font=("Microsoft YaHei", 10, "bold"))
+        self.lbl_occupancy_title.pack(side='left', expand=True)
+        ttk.Button(ctrl_frame, text="下一年 >>", command=lambda: self._change_occupancy_year(1)).pack(side='right', padx=10)
+
+        self.fig_occupancy = Figure(figsize=(8, 6), dpi=100)
+        self.canvas_occupancy = self._attach_canvas(self.fig_occupancy, self.tab_occupancy)
+        self.occupancy_chart = OccupancyChart(self.fig_occupancy)
+
+        self._update_occupancy_chart()
+
+    def _change_occupancy_year(self, offset):
+        y = self.view_occupancy_date.year + offset
+        self.view_occupancy_date = self.view_occupancy_date.replace(year=y)
+        self._update_occupancy_chart()
+
+    @timed("report.occupancy")
+    def _update_occupancy_chart(self):
+        year = self.view_occupancy_date.year
+        matrix = self.stats_cache.get("occupancy", self.view_occupancy_date)
+        total = sum(sum(row) for row in matrix)
+        self.lbl_occupancy_title.config(text=f"{year} 年度时段分布 (共 {total:.1f} 小时)")
+
+        self.occupancy_chart.update(year, matrix)
+        self.occupancy_chart.render()
+        self._prefetch_neighbours("occupancy", self.view_occupancy_date)
+
+    # =========================================================================
+    # 5. 相邻周期后台预取 (翻页时直接命中缓存)
+    # =========================================================================
+    def _start_prefetcher(self):
+        self._prefetch_gen = 0                   # 每次导航 +1，旧的预取任务随之作废
+        self._prefetch_jobs = queue.Queue()
+        self._prefetch_results = queue.Queue()
+        self._prefetch_polling = False
+        threading.Thread(target=self._prefetch_worker, daemon=True).start()
+        self.bind("<Destroy>", self._on_destroy, add="+")
+
+    def _prefetch_neighbours(self, view, anchor):
+        """当前页面画完后，把前后两个周期交给后台线程计算"""
+        self._prefetch_gen += 1
+        for nb in neighbour_anchors(view, anchor):
+            key = self.stats_cache.key_for(view, nb)
+            if key not in self.stats_cache:
+                self._prefetch_jobs.put((self._prefetch_gen, view, nb, key))
+        self._schedule_prefetch_poll()
+
+    def _prefetch_worker(self):
+        """后台线程：只读查询 DataManager，结果放进队列，由主线程取回"""
+        while True:
+            job = self._prefetch_jobs.get()
+            try:
+                if job is None:
+                    return
+                gen, view, anchor, key = job
+                if gen != self._prefetch_gen:
+                    continue  # 用户已经跳到别处，不再需要
+                try:
+                    result = self.stats_cache.compute(view, anchor)
+                except Exception as e:
+                    print(f"报表预取失败: {e}")
+                    continue
+                self._prefetch_results.put((key, result))
+            finally:
+                self._prefetch_jobs.task_done()
+
+    def _schedule_prefetch_poll(self):
+        if not self._prefetch_polling:
+            self._prefetch_polling = True
+            self.after(PREFETCH_POLL_MS, self._poll_prefetch)
+
+    def _poll_prefetch(self):
+        """主线程：把后台算好的结果放进缓存 (Tk 控件和缓存只在主线程访问)"""
+        self._prefetch_polling = False
+        while True:
+            try:
+                key, result = self._prefetch_results.get_nowait()
+            except queue.Empty:
+                break
+            self.stats_cache.put(key, result)
+        if self._prefetch_jobs.unfinished_tasks:
+            self._schedule_prefetch_poll()
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._prefetch_gen += 1
+            self._prefetch_jobs.put(None)
 
 # 测试入口
 if __name__ == "__main__":
@@ -1,9 +1,25 @@
 import json
 import os
+import copy
 import datetime
+import calendar
+import threading
+import bisect
+import time
+import struct
+import mmap
+import sqlite3
+import codecs
+import re
+from array import array
+from collections import deque
+from urllib.request import pathname2url
+
+from profiler import span, timed
 
 # 本地指针文件：只存储"真实数据文件在哪里"
 # 这样你可以把真实数据放在 OneDrive/Dropbox，而程序通过读取这个文件找到它
+# 可选的 archive_paths 列出只读的归档数据文件，统计时与当前数据文件合并
 LOCAL_POINTER_FILE = "pathCfg.json"
 
 # 新版数据文件的默认结构
@@ -15,19 +31,1097 @@ DEFAULT_DATA_STRUCTURE = {
     "records": []                  # 存储工作记录
 }
 
-class DataManager:
+# 追加日志 (JSON Lines)：JSON 格式下每次保存只追加一行，累计到一定条数后在后台合并回主数据文件
+JOURNAL_SUFFIX = ".journal.jsonl"
+JOURNAL_COMPACT_THRESHOLD = 50
+
+# 流式读取 JSON 数据文件：每次读入的字节数；启动时先从文件末尾读多少字节来预估"今日累计"
+STREAM_CHUNK_SIZE = 1 << 20
+TAIL_PREVIEW_BYTES = 256 * 1024
+
+# 按逻辑日预聚合的统计缓存 (每天：总秒数、记录条数、24小时开始时间分布)
+# 以数据文件+日志的大小/修改时间作为指纹，指纹不符就重新计算
+ROLLUP_SUFFIX = ".rollup.json"
+# 统计缓存的计算方式变化时 +1，旧缓存自动作废 (2: 跨逻辑日的记录按分界点拆分时长)
+ROLLUP_VERSION = 2
+
+# 二进制数据文件：固定 1KB 头部 (魔数 + 设置 JSON) + 每条记录 24 字节
+BINARY_EXTENSION = ".wlb"
+BINARY_MAGIC = b"WLOGBIN1"
+BINARY_HEADER_SIZE = 1024
+BINARY_RECORD = struct.Struct("<qqd")   # 开始秒数, 结束秒数, 时长
+
+# 进行中工作的检查点：固定 24 字节 (魔数, 开始秒数, 最后确认秒数)，每隔几分钟整体替换一次
+# 程序被强行结束时，下次启动把它补存为一条记录 (最多损失一个间隔)
+SESSION_SUFFIX = ".session"
+SESSION_MAGIC = b"WLOGSES1"
+SESSION_RECORD = struct.Struct("<8sqq")
+SESSION_CHECKPOINT_SECONDS = 120
+
+# SQLite 数据库文件：记录不载入内存，统计查询直接在数据库里 GROUP BY
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 时段占用统计往前多看几天，接住从范围开始之前跨进来的长记录
+OCCUPANCY_LOOKBACK_DAYS = 2
+
+# 时间戳统一换算成"本地墙上时间"的秒数 (不涉及时区)，逻辑日期/小时都可以直接做整数运算
+_EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = _EPOCH.toordinal()
+
+def to_epoch(dt):
+    """datetime -> 本地时间秒数"""
+    return (dt.toordinal() - EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+def from_epoch(ts):
+    """本地时间秒数 -> datetime"""
+    return _EPOCH + datetime.timedelta(seconds=ts)
+
+def day_index(d):
+    """date -> 距 1970-01-01 的天数，与 (秒数 // 86400) 同一坐标系"""
+    return d.toordinal() - EPOCH_ORDINAL
+
+def date_from_index(idx):
+    return datetime.date.fromordinal(idx + EPOCH_ORDINAL)
+
+def split_by_logical_day(start, end, duration, shift):
+    """
+    把一段工作按逻辑日分界点切开，返回 [(逻辑日, 秒数), ...]
+    各段按实际覆盖的时间比例分摊 duration；不跨分界点 (绝大多数记录) 时整段归开始那天
+    """
+    first = (start - shift) // 86400
+    if end <= start:
+        return [(first, duration)]
+    last = (end - 1 - shift) // 86400
+    if last == first:
+        return [(first, duration)]
+    span = end - start
+    parts = []
+    for day in range(first, last + 1):
+        lo = max(start, day * 86400 + shift)
+        hi = min(end, (day + 1) * 86400 + shift)
+        parts.append((day, duration * (hi - lo) / span))
+    return parts
+
+def hourly_occupancy(intervals, shift, first_day, last_day):
+    """
+    逻辑日 [first_day, last_day] 内，按 (逻辑日的星期几, 钟点) 累计的实际工作小时数，7 x 24
+    每段工作按它真正覆盖的小时格切分 (跨零点、跨一天分界点的部分各归各的格子)
+    扫描线：每段只在首尾两个小时格记零头，中间的整小时用差分数组标记，最后一次前缀和累加
+    代价是 O(记录数 + 范围内的小时数)，与单段工作的长短无关
+    """
+    lo = first_day * 86400 + shift
+    hi = (last_day + 1) * 86400 + shift
+    base = lo // 3600
+    n = (hi - lo) // 3600
+    partial = [0.0] * n         # 首尾零头 (秒)
+    diff = [0] * (n + 1)        # 整小时覆盖数的差分
+    for start, end in intervals:
+        start, end = max(start, lo), min(end, hi)
+        if end <= start:
+            continue
+        h0, h1 = start // 3600 - base, end // 3600 - base
+        if h0 == h1:
+            partial[h0] += end - start
+            continue
+        partial[h0] += (base + h0 + 1) * 3600 - start
+        if h1 < n:
+            partial[h1] += end - (base + h1) * 3600
+        diff[h0 + 1] += 1
+        diff[h1] -= 1
+
+    matrix = [[0.0] * 24 for _ in range(7)]
+    running = 0
+    for i in range(n):
+        running += diff[i]
+        seconds = partial[i] + running * 3600
+        if seconds:
+            hour = base + i
+            day = (hour * 3600 - shift) // 86400
+            # 1970-01-01 是星期四 (weekday 3)
+            matrix[(day + 3) % 7][hour % 24] += seconds / 3600.0
+    return matrix
+
+
+class RecordStore:
+    """
+    按列存储的工作记录：开始秒数、结束秒数、时长
+    每条记录只在载入时解析一次时间字符串，之后所有统计都在整数列上计算
+    """
     def __init__(self):
-        # 1. 加载指针，找到真实数据路径
-        self.data_file = self._load_local_pointer()
+        self.starts = array('q')
+        self.ends = array('q')
+        self.durations = array('d')
+
+    def __len__(self):
+        return len(self.starts)
+
+    def append(self, start, end, duration):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.durations.append(duration)
+
+    def add_record(self, r):
+        """解析一条 JSON 记录并追加，格式不对时返回 False"""
+        try:
+            start = to_epoch(datetime.datetime.fromisoformat(r['start']))
+            end = to_epoch(datetime.datetime.fromisoformat(r['end']))
+            duration = float(r['duration'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        self.append(start, end, duration)
+        return True
+
+    def get_record(self, i):
+        """还原为原 JSON 结构的一条记录"""
+        return {
+            "start": from_epoch(self.starts[i]).strftime(TIME_FORMAT),
+            "end": from_epoch(self.ends[i]).strftime(TIME_FORMAT),
+            "duration": self.durations[i]
+        }
+
+    def iter_records(self):
+        for i in range(len(self.starts)):
+            yield self.get_record(i)
+
+    def copy(self):
+        other = RecordStore()
+        other.starts = array('q', self.starts)
+        other.ends = array('q', self.ends)
+        other.durations = array('d', self.durations)
+        return other
+
+
+class WriteBehindQueue:
+    """
+    后台写盘队列：调用方只提交任务，由一个后台线程按提交顺序写文件，界面不会被慢速网盘卡住
+    - replace: 整文件写入，先写临时文件再 os.replace，中途崩溃也不会留下半截文件；
+               同一文件排队中的整文件写入只保留最新一份
+    - append:  追加一段文本 (日志行)，全部按顺序保留
+    - call:    在写盘线程里按顺序执行一个函数 (例如写好主文件后再裁剪日志)
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._busy = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit_replace(self, path, payload):
+        """payload 可以是字符串，也可以是到真正写盘时才调用的函数"""
+        with self._cond:
+            for op in reversed(self._pending):
+                if op[1] == path:
+                    if op[0] == "replace":
+                        op[2] = payload  # 合并：旧的那份不用再写了
+                        return
+                    break
+            self._pending.append(["replace", path, payload])
+            self._cond.notify_all()
+
+    def submit_append(self, path, text):
+        with self._cond:
+            self._pending.append(["append", path, text])
+            self._cond.notify_all()
+
+    def submit_call(self, path, func):
+        with self._cond:
+            self._pending.append(["call", path, func])
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """阻塞直到队列中的写入全部完成 (退出程序前调用)"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                kind, path, payload = self._pending.popleft()
+                self._busy = True
+            try:
+                with span("io." + kind):
+                    if kind == "replace":
+                        atomic_write(path, payload() if callable(payload) else payload)
+                    elif kind == "append":
+                        if isinstance(payload, bytes):
+                            with open(path, 'ab') as f:
+                                f.write(payload)
+                        else:
+                            with open(path, 'a', encoding='utf-8') as f:
+                                f.write(payload)
+                    else:
+                        payload()
+            except Exception as e:
+                print(f"写入文件失败 ({path}): {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+def atomic_write(path, content):
+    """
+    先写同目录下的临时文件再替换，目标文件要么是旧内容要么是新内容
+    content 可以是 str / bytes，也可以是逐块产出 str 或 bytes 的迭代器 (大文件边生成边写)
+    """
+    chunks = [content] if isinstance(content, (str, bytes)) else content
+    tmp_path = path + ".tmp"
+    f = None
+    try:
+        for chunk in chunks:
+            if f is None:
+                f = open(tmp_path, 'wb') if isinstance(chunk, bytes) else open(tmp_path, 'w', encoding='utf-8')
+            f.write(chunk)
+        if f is None:
+            f = open(tmp_path, 'wb')
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        if f is not None:
+            f.close()
+    os.replace(tmp_path, path)
+
+
+def backup_broken_file(path):
+    """读不出来的数据文件先改名备份，避免之后的保存把它覆盖掉"""
+    backup = f"{path}.broken-{time.strftime('%Y%m%d-%H%M%S')}"
+    try:
+        os.replace(path, backup)
+        print(f"已将无法读取的数据文件备份为: {backup}")
+    except OSError as e:
+        print(f"备份损坏的数据文件失败: {e}")
+
+
+class JsonStreamReader:
+    """
+    流式解析数据文件的顶层 JSON 对象，不把整个文件一次性读进内存
+    records 数组按块产出 ("records", 记录列表)，其他键整体产出 (键, 值)
+    """
+    _WS = re.compile(r'[ \t\n\r]*')
+    # 值后面紧跟到缓冲区末尾的只有数字字符时，这个数可能被块边界截断了 (例如 "1." + "5")
+    _NUMBER_TAIL = re.compile(r'[0-9+\-.eE]*\Z')
+
+    def __init__(self, f, total_size, progress=None, chunk_size=STREAM_CHUNK_SIZE):
+        self.f = f                      # 以二进制方式打开的文件
+        self.total_size = max(total_size, 1)
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def _fill(self):
+        """再读一块数据，顺便丢掉已经解析过的部分"""
+        if self.eof:
+            return False
+        raw = self.f.read(self.chunk_size)
+        self.bytes_read += len(raw)
+        if not raw:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self._utf8.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self._utf8.decode(raw)
+        self.pos = 0
+        if self.progress:
+            self.progress(min(self.bytes_read / self.total_size, 1.0))
+        return True
+
+    def _peek(self):
+        while True:
+            self.pos = self._WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def _expect(self, chars):
+        c = self._peek()
+        if not c or c not in chars:
+            raise ValueError(f"JSON 格式错误: 期望 {chars!r}，实际为 {c!r}")
+        self.pos += 1
+        return c
+
+    def _value(self):
+        while True:
+            self._peek()
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 可能只是这一块数据不完整，读入更多再试
+                if self._fill():
+                    continue
+                raise
+            if self._NUMBER_TAIL.match(self.buf, end) and self._fill():
+                continue  # 数字可能被块边界截断
+            self.pos = end
+            return value
+
+    def _array_batches(self):
+        """
+        逐批产出数组元素的列表 (开头的 '[' 已读过)
+        快速路径：缓冲区里到最后一个 "}," 为止的完整元素拼成一个数组，一次 json.loads 解析
+        (切点落在字符串或嵌套结构里时拼出来的不是合法 JSON，不会误解析)；
+        块边界、数组的最后一个元素和快速路径失败的那一段退回逐个解析
+        """
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        loads = self._decoder.decode
+        while True:
+            self._peek()  # 跳过空白，缓冲区用完时读入下一块
+            buf, pos = self.buf, self.pos
+            cut = buf.rfind("},", pos)
+            if cut >= 0:
+                try:
+                    batch = loads("[" + buf[pos:cut + 1] + "]")
+                except json.JSONDecodeError:
+                    pass
+                else:
+                    self.pos = cut + 2
+                    yield batch
+                    continue
+            # 逐个解析，直到越过失败的切点 (没有切点时只解析一个)
+            while True:
+                yield [self._value()]
+                if self._expect(",]") == "]":
+                    return
+                if self.pos > cut:
+                    break
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "records" and self._peek() == "[":
+                self.pos += 1
+                yield "records_begin", None
+                for batch in self._array_batches():
+                    yield "records", batch
+            else:
+                yield key, self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def read_tail_records(path, tail_bytes=TAIL_PREVIEW_BYTES):
+    """
+    只读数据文件末尾的一段，找出其中完整的记录 (记录按时间顺序追加，末尾就是最近的记录)
+    返回 (列存储, 覆盖起点)：覆盖起点之后的记录都在这段里；整份文件都读到了则为 None
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(size - tail_bytes, 0))
+        text = f.read().decode('utf-8', errors='ignore')
+    store = RecordStore()
+    for m in re.finditer(r'\{[^{}]*\}', text):
+        try:
+            store.add_record(json.loads(m.group()))
+        except ValueError:
+            pass
+    complete_from = None
+    if size > tail_bytes and len(store):
+        complete_from = min(store.starts)
+    return store, complete_from
+
+
+# ===========================
+# 存储后端
+# 每种文件格式一个类，接口相同：load / append_record / save_settings / write_full / write_rows
+# read_only=True (挂载的归档)：载入失败直接抛出，不备份改名，也不修补或改写文件
+# ===========================
+class JsonStorage:
+    """JSON 数据文件 (主文件 + 追加日志)，程序一直使用的格式"""
+    # 记录全部载入内存，由 DataManager 自己建索引和统计
+    queryable = False
+
+    def __init__(self, path, writer, read_only=False):
+        self.path = path
+        self.writer = writer
+        self.read_only = read_only
+        self.journal_seq = 0          # 已分配的最大日志序号
+        self.journal_pending = 0      # 尚未合并进主文件的日志条数
+        self.compacting = False
+        # 日志最后一行没有换行 (上次写到一半时崩溃)：下一次追加先补一个换行，不和坏行粘在一起
+        self.journal_unterminated = False
+
+    @property
+    def journal_file(self):
+        """追加日志文件路径 (与数据文件同目录，例如 work_data.journal.jsonl)"""
+        return os.path.splitext(self.path)[0] + JOURNAL_SUFFIX
+
+    def files(self):
+        """参与统计缓存指纹的文件"""
+        return (self.path, self.journal_file)
+
+    def load(self, progress=None, preview=None):
+        """
+        加载数据文件并合并追加日志，如果不存在则创建新结构，返回 (settings, store, invalid)
+        progress(比例): 流式解析的进度回调
+        preview(settings, 尾部记录, 覆盖起点): 开始逐条解析历史记录之前，先用文件末尾的记录回调一次
+        """
+        self.journal_seq = 0
+        self.journal_pending = 0
+
+        if not os.path.exists(self.path):
+            settings = copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"])
+            store, invalid = RecordStore(), []
+            # 主文件丢失但日志还在时，日志里的记录仍然可以找回
+            self._replay_journal(settings, store, invalid)
+            snapshot = {"settings": settings, "records": list(store.iter_records()) + invalid,
+                        "journal_seq": self.journal_seq}
+            self.writer.submit_replace(self.path, json.dumps(snapshot, indent=4))
+            self.journal_pending = 0
+            return settings, store, invalid
+
+        try:
+            return self._stream_snapshot(progress, preview)
+        except Exception as e:
+            if self.read_only:
+                raise
+            print(f"数据加载失败: {e}，使用默认空数据")
+            backup_broken_file(self.path)
+            self.journal_seq = 0
+            return copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"]), RecordStore(), []
+
+    def _stream_snapshot(self, progress, preview):
+        """逐条解析 records 数组，直接放进列存储，峰值内存不再是整份 JSON 对象树"""
+        # 基础格式校验：顶层必须是字典 (旧版 List 格式不做自动迁移，按损坏文件处理)
+        settings = None
+        store, invalid = RecordStore(), []
+        with open(self.path, 'rb') as f:
+            for key, value in JsonStreamReader(f, os.fstat(f.fileno()).st_size, progress):
+                if key == "records":
+                    for record in value:
+                        if not (isinstance(record, dict) and store.add_record(record)):
+                            invalid.append(record)
+                elif key == "records_begin":
+                    if preview:
+                        tail, complete_from = read_tail_records(self.path)
+                        for entry in self._read_journal(self.journal_file):
+                            if entry.get("op") == "record":
+                                tail.add_record(entry["data"])
+                        preview(settings or DEFAULT_DATA_STRUCTURE["settings"], tail, complete_from)
+                elif key == "settings":
+                    settings = value
+                elif key == "journal_seq":
+                    # 主文件里记录了它已经包含到第几条日志
+                    self.journal_seq = value
+
+        if not isinstance(settings, dict):
+            settings = copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"])
+        self._replay_journal(settings, store, invalid)
+        return settings, store, invalid
+
+    @staticmethod
+    def write_full(path, settings, store, invalid):
+        """把全部数据写成一个 JSON 文件 (导出/新建数据文件时使用)"""
+        JsonStorage.write_rows(path, settings, zip(store.starts, store.ends, store.durations), invalid)
+
+    @staticmethod
+    def write_rows(path, settings, rows, invalid=()):
+        """
+        rows: 按顺序产出 (开始秒数, 结束秒数, 时长) 的迭代器，边生成边写，不在内存里拼整个文件
+        输出与 json.dump(..., indent=4) 的排版一致
+        """
+        def chunks():
+            yield json.dumps({"settings": settings}, indent=4)[:-2] + ',\n    "records": ['
+            sep = "\n"
+            for start, end, duration in rows:
+                record = {"start": from_epoch(start).strftime(TIME_FORMAT),
+                          "end": from_epoch(end).strftime(TIME_FORMAT),
+                          "duration": duration}
+                yield sep + "        " + json.dumps(record, indent=4).replace("\n", "\n        ")
+                sep = ",\n"
+            for record in invalid:
+                yield sep + "        " + json.dumps(record, indent=4).replace("\n", "\n        ")
+                sep = ",\n"
+            yield "\n    ]\n}"
+
+        atomic_write(path, chunks())
+
+    # --- 追加日志 (Journal) ---
+    def _read_journal(self, path):
+        """逐行读取日志，跳过写了一半的坏行"""
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"日志行损坏，已跳过: {line[:60]}")
+        return entries
+
+    def _replay_journal(self, settings, store, invalid):
+        """把主文件之后的日志条目重新应用到内存数据上"""
+        self.journal_unterminated = self._ends_unterminated(self.journal_file)
+        base_seq = self.journal_seq
+        for entry in self._read_journal(self.journal_file):
+            seq = entry.get("seq", 0)
+            if seq <= base_seq:
+                continue  # 已经合并进主文件
+            op = entry.get("op")
+            if op == "record":
+                if not store.add_record(entry["data"]):
+                    invalid.append(entry["data"])
+            elif op == "setting":
+                settings[entry["key"]] = entry["value"]
+            self.journal_seq = max(self.journal_seq, seq)
+            self.journal_pending += 1
+
+    @staticmethod
+    def _ends_unterminated(path):
+        """文件非空且最后一个字节不是换行"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False  # 不存在或为空
+
+    def _append_journal(self, entry):
+        """追加一行日志，代价与历史记录数量无关 (调用方持有 DataManager 的锁)"""
+        self.journal_seq += 1
+        entry = dict(entry, seq=self.journal_seq)
+        line = json.dumps(entry) + "\n"
+        if self.journal_unterminated:
+            # 先结束掉崩溃时写了一半的那行，新条目才能单独成行被读回
+            line = "\n" + line
+            self.journal_unterminated = False
+        self.writer.submit_append(self.journal_file, line)
+        self.journal_pending += 1
+
+    def append_record(self, start, end, duration):
+        record = {
+            "start": from_epoch(start).strftime(TIME_FORMAT),
+            "end": from_epoch(end).strftime(TIME_FORMAT),
+            "duration": duration
+        }
+        self._append_journal({"op": "record", "data": record})
+
+    def save_settings(self, settings, key):
+        self._append_journal({"op": "setting", "key": key, "value": settings[key]})
+
+    def needs_compaction(self):
+        return not self.compacting and self.journal_pending >= JOURNAL_COMPACT_THRESHOLD
+
+    def compact(self, settings, store, invalid):
+        """
+        把传入的数据拷贝写成新的主文件，并从日志里删掉已合并的条目
+        调用方持有锁并传入拷贝；提交顺序保证：之前的日志行先写完，之后的日志行不会被裁掉
+        写主文件和裁剪日志是同一个后台任务：主文件没写成功 (例如被网盘同步锁住) 就不裁剪，
+        日志条目原样保留，下次保存时再尝试合并
+        """
+        self.compacting = True
+        journal_file = self.journal_file
+        seq = self.journal_seq
+        pending, self.journal_pending = self.journal_pending, 0
+
+        def build_snapshot():
+            snapshot = {
+                "settings": settings,
+                "records": list(store.iter_records()) + invalid,
+                "journal_seq": seq,
+            }
+            return json.dumps(snapshot, indent=4)
+
+        def write_and_trim():
+            try:
+                try:
+                    atomic_write(self.path, build_snapshot())
+                except Exception:
+                    self.journal_pending += pending
+                    raise
+                remaining = [e for e in self._read_journal(journal_file) if e.get("seq", 0) > seq]
+                if remaining:
+                    atomic_write(journal_file, "".join(json.dumps(e) + "\n" for e in remaining))
+                elif os.path.exists(journal_file):
+                    os.remove(journal_file)
+            finally:
+                self.compacting = False
+
+        self.writer.submit_call(self.path, write_and_trim)
+
+    def close(self):
+        pass
+
+
+class BinaryStorage:
+    """
+    定长二进制数据文件 (.wlb)
+    头部 1KB：魔数 + 设置 JSON 长度 + 设置 JSON；之后每条记录 24 字节 (int64 开始, int64 结束, float64 时长)
+    新记录直接追加到文件末尾，修改设置只覆盖头部；载入时用 mmap (有 NumPy 时整块转换)
+    """
+    queryable = False
+
+    def __init__(self, path, writer, read_only=False):
+        self.path = path
+        self.writer = writer
+        self.read_only = read_only
+
+    def files(self):
+        return (self.path,)
+
+    @staticmethod
+    def _pack_header(settings):
+        body = json.dumps(settings).encode('utf-8')
+        if len(body) > BINARY_HEADER_SIZE - len(BINARY_MAGIC) - 4:
+            raise ValueError("设置内容过长，超出二进制文件头部容量")
+        header = BINARY_MAGIC + struct.pack("<I", len(body)) + body
+        return header.ljust(BINARY_HEADER_SIZE, b"\0")
+
+    def load(self, progress=None, preview=None):
+        """返回 (settings, store, invalid)；二进制文件里不会有解析失败的记录 (整块转换很快，不需要进度回调)"""
+        if not os.path.exists(self.path):
+            settings = copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"])
+            self.writer.submit_replace(self.path, self._pack_header(settings))
+            return settings, RecordStore(), []
+
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(BINARY_HEADER_SIZE)
+                if len(header) < BINARY_HEADER_SIZE or not header.startswith(BINARY_MAGIC):
+                    raise ValueError("不是有效的二进制数据文件")
+                (length,) = struct.unpack_from("<I", header, len(BINARY_MAGIC))
+                settings = json.loads(header[len(BINARY_MAGIC) + 4:len(BINARY_MAGIC) + 4 + length])
+
+                size = os.fstat(f.fileno()).st_size
+                count = (size - BINARY_HEADER_SIZE) // BINARY_RECORD.size
+                store = RecordStore()
+                if count:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        self._unpack_records(mm, count, store)
+        except Exception as e:
+            if self.read_only:
+                raise
+            print(f"数据加载失败: {e}，使用默认空数据")
+            backup_broken_file(self.path)
+            return copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"]), RecordStore(), []
+
+        # 末尾写了一半的记录 (写入时崩溃) 要截掉，否则之后追加的记录全都错位
+        valid_size = BINARY_HEADER_SIZE + count * BINARY_RECORD.size
+        if size > valid_size and not self.read_only:
+            print(f"二进制数据文件末尾有 {size - valid_size} 字节不完整的记录，已截掉")
+            os.truncate(self.path, valid_size)
+        return settings, store, []
+
+    @staticmethod
+    def _unpack_records(buf, count, store):
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is not None:
+            dtype = np.dtype([("start", "<i8"), ("end", "<i8"), ("duration", "<f8")])
+            rows = np.frombuffer(buf, dtype=dtype, count=count, offset=BINARY_HEADER_SIZE)
+            store.starts.frombytes(rows["start"].astype(np.int64).tobytes())
+            store.ends.frombytes(rows["end"].astype(np.int64).tobytes())
+            store.durations.frombytes(rows["duration"].astype(np.float64).tobytes())
+            del rows  # 释放对 mmap 的引用，之后才能关闭
+            return
+
+        end = BINARY_HEADER_SIZE + count * BINARY_RECORD.size
+        for start, stop, duration in BINARY_RECORD.iter_unpack(buf[BINARY_HEADER_SIZE:end]):
+            store.append(start, stop, duration)
+
+    @staticmethod
+    def write_full(path, settings, store, invalid):
+        if invalid:
+            print(f"二进制格式无法保存 {len(invalid)} 条格式错误的记录，已跳过")
+        BinaryStorage.write_rows(path, settings, zip(store.starts, store.ends, store.durations))
+
+    @staticmethod
+    def write_rows(path, settings, rows, invalid=()):
+        """rows: 按顺序产出 (开始秒数, 结束秒数, 时长) 的迭代器，每攒够 4096 条写一次"""
+        def chunks():
+            yield BinaryStorage._pack_header(settings)
+            batch = []
+            for row in rows:
+                batch.append(BINARY_RECORD.pack(*row))
+                if len(batch) >= 4096:
+                    yield b"".join(batch)
+                    batch = []
+            yield b"".join(batch)
+
+        atomic_write(path, chunks())
+
+    def append_record(self, start, end, duration):
+        self.writer.submit_append(self.path, BINARY_RECORD.pack(start, end, duration))
+
+    def save_settings(self, settings, key):
+        header = self._pack_header(settings)
+
+        def rewrite_header():
+            with open(self.path, 'r+b') as f:
+                f.write(header)
+
+        self.writer.submit_call(self.path, rewrite_header)
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self, settings, store, invalid):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """
+    SQLite 数据库 (.db)：WAL 模式，记录带逻辑日期列，并在逻辑日期和开始时间上建索引
+    segments 表保存按逻辑日分界点拆分后的时长 (写入时拆好，查询时直接求和)
+    记录不载入内存，报表统计直接用 SQL GROUP BY 聚合 (queryable = True)
+    写入量很小且数据库在本地事务中完成，所以直接同步执行，保存后立即可查
+    """
+    queryable = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            logical_day INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_day ON records (logical_day, start, duration);
+        CREATE INDEX IF NOT EXISTS idx_records_start ON records (start);
+        CREATE TABLE IF NOT EXISTS segments (
+            record_id INTEGER NOT NULL,
+            logical_day INTEGER NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_segments_day ON segments (logical_day, seconds);
+    """
+    # PRAGMA user_version：1 = segments 表已按当前记录建好 (旧数据库打开时补建)
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path, writer, read_only=False):
+        self.path = path
+        self.writer = writer
+        self.read_only = read_only
+        self.conn = None
+        self.shift = 0
+        # 数据库里的 logical_day 列和 segments 表是按哪个分界点算的，以及 segments 表是否已建好
+        self._stored_shift = 0
+        self._schema_current = True
+
+    @staticmethod
+    def _connect(path, read_only=False):
+        # 可能在后台加载线程里打开、在主线程里查询，访问由 DataManager 的锁串行化
+        if read_only:
+            # 只读打开：不切换日志模式、不建表，数据库文件不会被改动
+            uri = "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SqliteStorage.SCHEMA)
+        return conn
+
+    def files(self):
+        return (self.path,)
+
+    def load(self, progress=None, preview=None):
+        """只读取设置，记录留在数据库里；返回的列存储为空"""
+        self.conn = self._connect(self.path, self.read_only)
+        settings = {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM settings")}
+        if not settings:
+            settings = copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"])
+            if not self.read_only:
+                with self.conn:
+                    self.conn.executemany("INSERT INTO settings VALUES (?, ?)",
+                                          [(k, json.dumps(v)) for k, v in settings.items()])
+        self.shift = self._stored_shift = settings.get("day_offset_hour", 4) * 3600
+        self._schema_current = self.conn.execute("PRAGMA user_version").fetchone()[0] >= self.SCHEMA_VERSION
+        if not self._schema_current:
+            if self.read_only:
+                self._shadow_tables(self.shift)
+            else:
+                with self.conn:
+                    self._rebuild_segments(self.conn, self.shift)
+                    self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+                self._schema_current = True
+        return settings, RecordStore(), []
+
+    def use_day_offset(self, hour):
+        """只读打开时换一个分界点统计 (归档跟随当前数据文件)，数据库文件不动"""
+        if hour * 3600 != self.shift:
+            self._shadow_tables(hour * 3600)
+
+    def _shadow_tables(self, shift):
+        """
+        在这条连接的临时库里按 shift 建同名的 records / segments 表：SQLite 先在 temp 里找表，
+        所有查询原样不改就会改用临时表；回到数据库自己的分界点 (且表结构是新的) 时删掉临时表
+        """
+        self.shift = shift
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS temp.records")
+            self.conn.execute("DROP TABLE IF EXISTS temp.segments")
+            if shift == self._stored_shift and self._schema_current:
+                return
+            self.conn.execute(
+                "CREATE TEMP TABLE records AS "
+                "SELECT id, start, end, duration, (start - ?) / 86400 AS logical_day FROM main.records", (shift,))
+            self.conn.execute(
+                "CREATE TEMP TABLE segments (record_id INTEGER NOT NULL, logical_day INTEGER NOT NULL, seconds REAL NOT NULL)")
+            self.conn.execute("CREATE INDEX temp.idx_records_day ON records (logical_day, start, duration)")
+            self.conn.execute("CREATE INDEX temp.idx_records_start ON records (start)")
+            self.conn.execute("CREATE INDEX temp.idx_segments_day ON segments (logical_day, seconds)")
+            self._rebuild_segments(self.conn, shift)
+
+    @staticmethod
+    def _rebuild_segments(conn, shift):
+        """按当前分界点重建 segments 表 (调用方负责事务)；不跨天的记录在 SQL 里整段复制，跨天的逐条拆分"""
+        conn.execute("DELETE FROM segments")
+        conn.execute(
+            "INSERT INTO segments (record_id, logical_day, seconds) SELECT id, logical_day, duration FROM records "
+            "WHERE end <= start OR (end - 1 - ?) / 86400 = logical_day", (shift,))
+        multi = conn.execute(
+            "SELECT id, start, end, duration FROM records WHERE end > start AND (end - 1 - ?) / 86400 > logical_day",
+            (shift,)).fetchall()
+        conn.executemany(
+            "INSERT INTO segments (record_id, logical_day, seconds) VALUES (?, ?, ?)",
+            [(rid, day, seconds) for rid, st, en, du in multi for day, seconds in split_by_logical_day(st, en, du, shift)])
+
+    @staticmethod
+    def write_full(path, settings, store, invalid):
+        """一次性导入：把全部数据写成一个新的 SQLite 数据库"""
+        if invalid:
+            print(f"SQLite 格式无法保存 {len(invalid)} 条格式错误的记录，已跳过")
+        SqliteStorage.write_rows(path, settings, zip(store.starts, store.ends, store.durations))
+
+    @staticmethod
+    def write_rows(path, settings, rows, invalid=()):
+        """rows: 按顺序产出 (开始秒数, 结束秒数, 时长) 的迭代器，在一个事务里逐条插入"""
+        if os.path.exists(path):
+            os.remove(path)
+        shift = settings.get("day_offset_hour", 4) * 3600
+        conn = SqliteStorage._connect(path)
+        try:
+            with conn:
+                conn.executemany("INSERT INTO settings VALUES (?, ?)",
+                                 [(k, json.dumps(v)) for k, v in settings.items()])
+                conn.executemany(
+                    "INSERT INTO records (start, end, duration, logical_day) VALUES (?, ?, ?, ?)",
+                    ((st, en, du, (st - shift) // 86400) for st, en, du in rows))
+                SqliteStorage._rebuild_segments(conn, shift)
+                conn.execute(f"PRAGMA user_version = {SqliteStorage.SCHEMA_VERSION}")
+        finally:
+            conn.close()
+
+    def append_record(self, start, end, duration):
+        with self.conn:
+            rid = self.conn.execute(
+                "INSERT INTO records (start, end, duration, logical_day) VALUES (?, ?, ?, ?)",
+                (start, end, duration, (start - self.shift) // 86400)).lastrowid
+            self.conn.executemany(
+                "INSERT INTO segments (record_id, logical_day, seconds) VALUES (?, ?, ?)",
+                [(rid, day, seconds) for day, seconds in split_by_logical_day(start, end, duration, self.shift)])
+
+    def save_settings(self, settings, key):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings VALUES (?, ?)", (key, json.dumps(settings[key])))
+            if key == "day_offset_hour":
+                # 一天的分界点变了，逻辑日期列整体重算
+                self.shift = settings[key] * 3600
+                self.conn.execute("UPDATE records SET logical_day = (start - ?) / 86400", (self.shift,))
+                self._rebuild_segments(self.conn, self.shift)
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self, settings, store, invalid):
+        pass
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    # --- 直接在数据库里完成的查询 ---
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def read_store(self):
+        """把全部记录读成列存储 (导出时使用)"""
+        store = RecordStore()
+        for row in self.conn.execute("SELECT start, end, duration FROM records ORDER BY start, id"):
+            store.append(*row)
+        return store
+
+    def day_range(self):
+        """(最早逻辑日, 最晚逻辑日)，没有记录时为 (None, None)"""
+        return self.conn.execute("SELECT MIN(logical_day), MAX(logical_day) FROM records").fetchone()
+
+    def intervals_in_range(self, first_day, last_day):
+        """逻辑日期在范围内的记录的 (开始秒数, 结束秒数)"""
+        return self.conn.execute("SELECT start, end FROM records WHERE logical_day BETWEEN ? AND ?",
+                                 (first_day, last_day)).fetchall()
+
+    def records_in_range(self, first_day, last_day):
+        rows = self.conn.execute(
+            "SELECT start, end, duration FROM records WHERE logical_day BETWEEN ? AND ? ORDER BY start, id",
+            (first_day, last_day))
+        store = RecordStore()
+        for row in rows:
+            store.append(*row)
+        return list(store.iter_records())
+
+    def rollup_range(self, first_day, last_day):
+        """与内存统计缓存相同的结构：{逻辑日: [总秒数, 条数, 24小时开始分布]}，总秒数取拆分后的时长"""
+        days = {}
+        for day, seconds in self.conn.execute(
+                "SELECT logical_day, SUM(seconds) FROM segments "
+                "WHERE logical_day BETWEEN ? AND ? GROUP BY logical_day", (first_day, last_day)):
+            days[day] = [seconds, 0, [0] * 24]
+        for day, count in self.conn.execute(
+                "SELECT logical_day, COUNT(*) FROM records "
+                "WHERE logical_day BETWEEN ? AND ? GROUP BY logical_day", (first_day, last_day)):
+            days.setdefault(day, [0.0, 0, [0] * 24])[1] = count
+        for day, hour, count in self.conn.execute(
+                "SELECT logical_day, start / 3600 % 24, COUNT(*) FROM records "
+                "WHERE logical_day BETWEEN ? AND ? GROUP BY logical_day, start / 3600 % 24",
+                (first_day, last_day)):
+            days[day][2][hour] = count
+        return days
+
+
+def storage_class_for(path):
+    """按扩展名选择存储后端，未知扩展名按 JSON 处理"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == BINARY_EXTENSION:
+        return BinaryStorage
+    if ext in SQLITE_EXTENSIONS:
+        return SqliteStorage
+    return JsonStorage
+
+
+def convert_data_file(src_path, dst_path):
+    """一次性转换/导入：读取任意格式的数据文件，按目标扩展名的格式写出"""
+    writer = WriteBehindQueue()
+    storage = storage_class_for(src_path)(src_path, writer)
+    settings, store, invalid = storage.load()
+    if storage.queryable:
+        store = storage.read_store()
+    storage.close()
+    writer.flush()
+    storage_class_for(dst_path).write_full(dst_path, settings, store, invalid)
+    return len(store)
+
+
+class DataManager:
+    def __init__(self, autoload=True, data_file=None, recover_session=True, read_only=False,
+                 day_offset_hour=None, vectorize=None):
+        """
+        autoload=False 时只定位数据文件，由调用方稍后 (通常在后台线程) 调用 load()
+        data_file: 直接使用这个数据文件，不读指针文件 (导出等离线工具使用，也不挂载归档)
+        recover_session=False: 不补存遗留的检查点 (主程序可能正开着，检查点属于它)
+        read_only: 归档文件，只查询不保存 (不存在或读不出来时抛出异常，文件本身不会被改动)
+        day_offset_hour: 不用文件里的设置，按这个分界点统计 (归档跟随当前数据文件，载入时直接按它建索引)
+        vectorize: 重建索引和按日统计是否用 NumPy；None 表示装了 NumPy 就用 (aggregation.enabled())
+        """
+        self.read_only = read_only
+        self._day_offset_hour = day_offset_hour
+        self.vectorize = vectorize
+        # 最近一次按日统计从哪里来："python" / "numpy" 重新计算，"cache" 读的磁盘缓存 (等价性检查用)
+        self.rollup_source = None
+        # 指针文件里配置的归档路径，以及已经成功载入的归档 {路径: 只读 DataManager}
+        self.archive_paths = []
+        self.archives = {}
+        # 后台合并日志与主线程写入共用的锁
+        self._lock = threading.RLock()
+        self._rollup_dirty = False
+        # 数据版本号：任何记录或设置变化都会 +1，报表缓存据此判断是否过期
+        self.data_version = 0
+        # 数据加载完成的标志，写操作会等它置位后再执行；载入失败时同样置位，异常记在 load_error
+        self.loaded = threading.Event()
+        self.load_error = None
+        # 加载进度 (0~1) 与加载期间根据文件末尾估算的"今日累计" (逻辑日, 秒数)
+        self.load_progress = 0.0
+        self._preview_today = None
+        # 当前正在写检查点的工作开始时间 (epoch 秒)；上次异常退出遗留的检查点
+        self._session_start = None
+        self._orphan_session = None
+        # 所有写盘操作都交给后台队列
+        self._writer = WriteBehindQueue()
+
+        # 1. 加载指针，找到真实数据路径，并按扩展名选择存储格式
+        if data_file:
+            self.data_file = os.path.abspath(data_file)
+        else:
+            self.data_file, self.archive_paths = self._load_local_pointer()
+        self.storage = storage_class_for(self.data_file)(self.data_file, self._writer, read_only)
+        # 上次被强行结束时留下的检查点 (只有 24 字节，直接同步读取)
+        if recover_session:
+            self._orphan_session = self._read_session_checkpoint()
+
+        # 载入完成前先用默认设置和空记录占位，界面可以照常读取
+        self._reset_memory(copy.deepcopy(DEFAULT_DATA_STRUCTURE["settings"]))
         
-        # 2. 加载全部数据到内存 (Settings + Records)
-        self.full_data = self._load_or_init_data_file()
+        # 2. 加载全部数据到内存 (Settings + 按列存储的 Records)，并合并追加日志
+        if autoload:
+            self.load()
+
+    def load(self):
+        """
+        读取数据文件到内存 (耗时操作，可在后台线程调用)
+        失败时异常记在 load_error 并重新抛出；loaded 无论成败都会置位，等待它的写操作不会一直卡住
+        """
+        try:
+            self._set_content(*self._load_or_init_data_file(self._on_load_progress, self._on_load_preview))
+            self._mount_listed()
+        except Exception as e:
+            self.load_error = e
+            print(f"数据文件载入失败: {e}")
+            raise
+        finally:
+            self.load_progress = 1.0
+            self.loaded.set()
+        self._recover_session()
+
+    def _on_load_progress(self, fraction):
+        self.load_progress = fraction
+
+    def _on_load_preview(self, settings, tail, complete_from):
+        """
+        用文件末尾的记录估算今日累计，让界面在全部解析完之前就能显示
+        只有末尾这段覆盖了整个逻辑今天时才采用 (complete_from 之前的记录不在其中)
+        """
+        offset = settings.get("day_offset_hour", 4) * 3600
+        today = (to_epoch(datetime.datetime.now()) - offset) // 86400
+        if complete_from is not None and (complete_from - offset) // 86400 >= today:
+            return
+        total = 0
+        for start, end, duration in zip(tail.starts, tail.ends, tail.durations):
+            for day, seconds in split_by_logical_day(start, end, duration, offset):
+                if day == today:
+                    total += seconds
+        self._preview_today = (today, total)
+
+    def _wait_loaded(self):
+        """写操作必须等数据加载完，否则会被随后载入的数据覆盖；载入失败时抛出 RuntimeError"""
+        self.loaded.wait()
+        if self.load_error is not None:
+            raise RuntimeError(f"数据文件未能载入，无法保存: {self.load_error}")
 
     # ===========================
     # 文件与路径管理
     # ===========================
     def _load_local_pointer(self):
-        """读取本地指针文件，获取数据文件的绝对路径"""
+        """读取本地指针文件，返回 (数据文件的绝对路径, 归档文件路径列表)"""
         default_path = os.path.abspath("./work_data.json")
         
         if os.path.exists(LOCAL_POINTER_FILE):
@@ -37,125 +1131,356 @@ class DataManager:
                     path = config.get("data_path", default_path)
                     # 如果记录的路径不存在（比如移动了文件夹），回退到默认
                     # 也可以选择不回退，抛出错误，这里暂且回退
-                    return path
+                    return path, list(config.get("archive_paths", []))
             except:
                 pass
-        return default_path
+        return default_path, []
+
+    def _write_local_pointer(self):
+        config = {"data_path": self.data_file}
+        if self.archive_paths:
+            config["archive_paths"] = self.archive_paths
+        with open(LOCAL_POINTER_FILE, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4)
 
     def save_local_pointer(self, new_path):
-        """更新本地指针 (当用户修改数据文件位置时调用)"""
+        """更新本地指针 (当用户修改数据文件位置时调用)；当前文件载入失败时也可以用它换到别的文件"""
+        self.loaded.wait()
+        # 切换前把旧文件还没写完的内容落盘 (也可能切回的正是它)
+        self._writer.flush()
+        with self._lock:
+            self.storage.close()
+        # 进行中工作的检查点跟着数据文件走
+        session_start = self._session_start
+        if session_start is not None:
+            self.clear_session()
         self.data_file = new_path
+        self.storage = storage_class_for(new_path)(new_path, self._writer)
+        self._orphan_session = self._read_session_checkpoint()
+        # 切换到的正是某个归档时，它不再作为归档挂载 (否则会重复统计)
+        if self._same_file(new_path, self.archive_paths):
+            self.unmount_archive(self._same_file(new_path, self.archive_paths))
         
         # 1. 保存指针文件
-        with open(LOCAL_POINTER_FILE, 'w', encoding='utf-8') as f:
-            json.dump({"data_path": new_path}, f, indent=4)
+        self._write_local_pointer()
             
         # 2. 重新加载或初始化新位置的数据文件
-        self.full_data = self._load_or_init_data_file()
+        try:
+            with self._lock:
+                self._set_content(*self._load_or_init_data_file())
+        except Exception as e:
+            self.load_error = e
+            raise
+        if self.load_error is not None:
+            # 之前整体载入失败，归档也还没挂载
+            self.load_error = None
+            self._mount_listed()
+        with self._lock:
+            archives = list(self.archives.values())
+        for archive in archives:
+            archive._follow_day_offset(self.get_setting("day_offset_hour", 4))
+        self._recover_session()
+        if session_start is not None:
+            self.checkpoint_session(from_epoch(session_start))
+
+    # ===========================
+    # 只读归档 (多个数据文件合并统计)
+    # ===========================
+    @staticmethod
+    def _same_file(path, candidates):
+        """candidates 中与 path 指向同一文件的那个 (没有则返回 None)"""
+        target = os.path.normcase(os.path.abspath(path))
+        for other in candidates:
+            if os.path.normcase(os.path.abspath(other)) == target:
+                return other
+        return None
+
+    def _mount(self, path):
+        """
+        载入一个归档：它有自己的列存储、逻辑日期索引和统计缓存 (缓存文件放在归档旁边)，
+        之后每次保存只更新当前数据文件的索引，归档不参与，所以归档再多也不拖慢保存
+        一天的分界点以当前数据文件的设置为准，载入时就按它建索引，统计缓存也按它保存，下次启动直接命中
+        载入失败时抛出异常
+        """
+        archive = DataManager(data_file=path, recover_session=False, read_only=True,
+                              day_offset_hour=self.get_setting("day_offset_hour", 4))
+        with self._lock:
+            self.archives[path] = archive
+            self.data_version += 1
+
+    def _mount_listed(self):
+        """挂载指针文件里列出、还没载入的归档；某个归档读不出来只打印，不影响当前数据文件"""
+        for path in self.archive_paths:
+            if path in self.archives:
+                continue
+            try:
+                self._mount(path)
+            except Exception as e:
+                print(f"归档载入失败 ({path}): {e}")
+
+    def mount_archive(self, path):
+        """挂载一个只读归档并写进指针文件 (列表里未能载入的归档可以再试一次)；失败时抛出 ValueError"""
+        self._wait_loaded()
+        path = os.path.abspath(path)
+        if self._same_file(path, [self.data_file]):
+            raise ValueError("这是当前正在使用的数据文件")
+        listed = self._same_file(path, self.archive_paths)
+        if listed in self.archives:
+            raise ValueError("该文件已经挂载")
+        if not os.path.exists(path):
+            raise ValueError(f"文件不存在: {path}")
+        try:
+            self._mount(listed or path)
+        except Exception as e:
+            raise ValueError(f"无法读取: {path}\n{e}")
+        if listed is None:
+            self.archive_paths.append(path)
+            self._write_local_pointer()
+
+    def unmount_archive(self, path):
+        """取消挂载 (文件本身不动)"""
+        with self._lock:
+            archive = self.archives.pop(path, None)
+            self.data_version += 1
+        if archive is not None:
+            archive.close()
+        if path in self.archive_paths:
+            self.archive_paths.remove(path)
+            self._write_local_pointer()
+
+    def _follow_day_offset(self, hour):
+        """归档跟随当前数据文件的分界点：只改内存并重建索引 (SQLite 归档在连接的临时库里重算)，文件不动"""
+        self._day_offset_hour = hour
+        if self.get_setting("day_offset_hour", 4) == hour:
+            return
+        with self._lock:
+            self.settings["day_offset_hour"] = hour
+            self.data_version += 1
+            if self.storage.queryable:
+                self.storage.use_day_offset(hour)
+            else:
+                self._rebuild_index()
+
+    def _reset_memory(self, settings):
+        """清空内存中的记录、索引和统计缓存"""
+        self.data_version += 1
+        self.settings = settings
+        self.store = RecordStore()
+        # 解析不了的记录原样保留，写回文件时不丢失
+        self._invalid_records = []
+        self._index_ids = array('q')
+        self._index_keys = array('q')
+        self._rollup = {}
 
-    def _load_or_init_data_file(self):
-        """加载数据文件，如果不存在则创建新结构"""
+    def _set_content(self, settings, store, invalid):
+        """换上新载入的 settings + 列存储，并重建索引"""
+        self._reset_memory(settings)
+        if self._day_offset_hour is not None and settings.get("day_offset_hour", 4) != self._day_offset_hour:
+            settings["day_offset_hour"] = self._day_offset_hour
+            if self.storage.queryable:
+                self.storage.use_day_offset(self._day_offset_hour)
+        self.store = store
+        self._invalid_records = invalid
+        self._rebuild_index(use_cache=True)
+
+        # 积压的日志较多时顺便合并 (必须在内存数据就绪之后)
+        self._maybe_compact()
+
+    def _copy_store(self):
+        """当前全部记录的一份拷贝 (SQLite 后端从数据库读出)，调用方持有锁"""
+        if self.storage.queryable:
+            return self.storage.read_store()
+        return self.store.copy()
+
+    def record_count(self):
+        """当前数据文件加上全部归档的记录数"""
+        with self._lock:
+            archives = list(self.archives.values())
+            count = self.storage.count() if self.storage.queryable else len(self.store)
+        return count + sum(a.record_count() for a in archives)
+
+    def export_to(self, path, include_records=True):
+        """
+        按目标扩展名的格式把当前数据写成一个新文件 (JSON <-> 二进制 互相转换无损)
+        include_records=False 时只复制设置，得到一个空数据库；挂载的归档不会一起导出
+        当前文件载入失败时只能建空数据库 (使用默认设置)，这样用户还能换到一个新文件
+        """
+        if include_records:
+            self._wait_loaded()
+        else:
+            self.loaded.wait()
+        with self._lock:
+            settings = dict(self.settings)
+            store = self._copy_store() if include_records else RecordStore()
+            invalid = list(self._invalid_records) if include_records else []
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        storage_class_for(path).write_full(path, settings, store, invalid)
+
+    @property
+    def rollup_file(self):
+        """统计缓存文件路径 (例如 work_data.rollup.json)"""
+        return os.path.splitext(self.data_file)[0] + ROLLUP_SUFFIX
+
+    @property
+    def session_file(self):
+        """进行中工作的检查点文件路径 (例如 work_data.session)"""
+        return os.path.splitext(self.data_file)[0] + SESSION_SUFFIX
+
+    @timed("load.data_file")
+    def _load_or_init_data_file(self, progress=None, preview=None):
+        """加载数据文件，如果不存在则创建新结构，返回 (settings, store, invalid)"""
+        if self.read_only and not os.path.exists(self.data_file):
+            raise FileNotFoundError(self.data_file)
         # 确保目录存在
         folder = os.path.dirname(self.data_file)
         if folder and not os.path.exists(folder):
             os.makedirs(folder)
+        return self.storage.load(progress=progress, preview=preview)
 
-        if not os.path.exists(self.data_file):
-            self._save_file_content(DEFAULT_DATA_STRUCTURE)
-            return DEFAULT_DATA_STRUCTURE
-
-        try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-                
-            # 基础格式校验：确保它是字典且包含必要的key
-            # 如果是旧版 List 格式，这里不处理迁移，直接报错或返回空结构(按你要求不写自动迁移)
-            if not isinstance(content, dict):
-                return DEFAULT_DATA_STRUCTURE
-            
-            if "settings" not in content:
-                content["settings"] = DEFAULT_DATA_STRUCTURE["settings"]
-            if "records" not in content:
-                content["records"] = []
-                
-            return content
-        except Exception as e:
-            print(f"数据加载失败: {e}，使用默认空数据")
-            return DEFAULT_DATA_STRUCTURE
+    def flush(self):
+        """等待所有排队中的写入落盘"""
+        self._writer.flush()
 
-    def _save_file_content(self, data):
-        """底层保存方法"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+    def _maybe_compact(self):
+        """JSON 日志积压到一定条数时合并回主文件 (其他格式没有日志，什么都不做)"""
+        if self.read_only:
+            return
+        with self._lock:
+            if not self.storage.needs_compaction():
+                return
+            self.storage.compact(dict(self.settings), self.store.copy(), list(self._invalid_records))
+            # 文件重写后指纹会变，顺便刷新统计缓存
+            self.save_rollup()
 
     # ===========================
     # 设置 (Settings) 操作
     # ===========================
     def get_setting(self, key, default=None):
         """获取某项设置"""
-        return self.full_data.get("settings", {}).get(key, default)
+        return self.settings.get(key, default)
 
     def update_setting(self, key, value):
-        """更新设置并保存到文件"""
-        if "settings" not in self.full_data:
-            self.full_data["settings"] = {}
-        
-        self.full_data["settings"][key] = value
-        self._save_file_content(self.full_data)
+        """更新设置并追加到日志"""
+        if self.read_only:
+            raise PermissionError(f"归档文件只读: {self.data_file}")
+        self._wait_loaded()
+        with self._lock:
+            self.settings[key] = value
+            self.data_version += 1
+            self.storage.save_settings(self.settings, key)
+            # 一天的分界点变了，逻辑日期索引需要重建 (归档也跟着重建)
+            if key == "day_offset_hour":
+                self._rebuild_index()
+            archives = list(self.archives.values())
+        if key == "day_offset_hour":
+            for archive in archives:
+                archive._follow_day_offset(value)
 
     # ===========================
     # 记录 (Records) 操作
     # ===========================
     def load_records(self):
-        """获取记录列表 (只读引用)"""
-        return self.full_data.get("records", [])
+        """获取记录列表 (由列存储按需还原，修改它不会影响数据)"""
+        with self._lock:
+            return list(self._copy_store().iter_records())
 
+    @timed("io.save_record")
     def save_record(self, start_dt, end_dt):
         """保存单条记录"""
         duration = (end_dt - start_dt).total_seconds()
         
+        if self.read_only:
+            raise PermissionError(f"归档文件只读: {self.data_file}")
         # 过滤小于60秒的记录
         if duration < 60:
             print(f"时长过短 ({duration}s)，忽略该记录。")
             return
 
-        new_record = {
-            "start": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-            "end": end_dt.strftime("%Y-%m-%d %H:%M:%S"),
-            "duration": duration
-        }
+        self._wait_loaded()
+        start, end = to_epoch(start_dt), to_epoch(end_dt)
         
-        # 更新内存
-        if "records" not in self.full_data:
-            self.full_data["records"] = []
-        
-        self.full_data["records"].append(new_record)
-        
-        # 写入文件
-        self._save_file_content(self.full_data)
+        with self._lock:
+            # 更新内存 (列存储)；SQLite 后端的记录不在内存里
+            if not self.storage.queryable:
+                self.store.append(start, end, duration)
+                self._index_record(len(self.store) - 1)
+            self.data_version += 1
+            
+            # 只追加一条 (JSON 日志行 / 二进制定长记录)，不再重写整个数据文件
+            self.storage.append_record(start, end, duration)
+        self._maybe_compact()
 
-    def get_today_total_seconds(self):
-        """获取'逻辑今天'的总工作时长(秒)"""
-        records = self.load_records()
-        today = datetime.date.today()
-        
-        # 动态获取当前的偏移量设置 (之前是读config，现在读self.data)
-        # 注意：这里需要重新获取逻辑日期，因为可能用户刚改了 offset
-        
+    # ===========================
+    # 进行中工作的检查点
+    # ===========================
+    def checkpoint_session(self, start_dt, now=None):
+        """记录'从 start_dt 开始的工作到 now 为止仍在进行'，只替换 24 字节的小文件，不碰数据文件"""
+        now = now or datetime.datetime.now()
+        self._session_start = to_epoch(start_dt)
+        payload = SESSION_RECORD.pack(SESSION_MAGIC, self._session_start, to_epoch(now))
+        self._writer.submit_replace(self.session_file, payload)
+
+    def clear_session(self):
+        """工作正常结束 (记录已保存) 后删除检查点"""
+        self._session_start = None
+        self._remove_session_file()
+
+    def _remove_session_file(self):
+        path = self.session_file
+        self._writer.submit_call(path, lambda: os.path.exists(path) and os.remove(path))
+
+    def _read_session_checkpoint(self):
+        """读取检查点，返回 (开始秒数, 最后确认秒数)，没有或无效时返回 None"""
+        try:
+            with open(self.session_file, 'rb') as f:
+                magic, start, last_seen = SESSION_RECORD.unpack(f.read(SESSION_RECORD.size))
+        except FileNotFoundError:
+            return None
+        except (OSError, struct.error) as e:
+            print(f"会话检查点读取失败: {e}")
+            return None
+        if magic != SESSION_MAGIC or last_seen < start:
+            return None
+        return start, last_seen
+
+    def _recover_session(self):
+        """上次没有正常结束的工作：按最后一次检查点的时间补存为一条记录"""
+        orphan, self._orphan_session = self._orphan_session, None
+        if orphan is None:
+            return
+        start_dt, end_dt = from_epoch(orphan[0]), from_epoch(orphan[1])
+        print(f"发现上次未正常结束的工作 ({start_dt} ~ {end_dt})，已补存为一条记录")
+        self.save_record(start_dt, end_dt)
+        if self._session_start is None:
+            # 已经开始了新的工作时检查点属于新工作，不能删
+            self._remove_session_file()
+
+    @timed("query.today")
+    def get_today_total_seconds(self, live_start=None):
+        """
+        获取'逻辑今天'的总工作时长(秒)
+        live_start: 正在进行中的工作开始时间，传入时一并计入 (不写盘)
+        """
+        # 注意：每次都重新计算逻辑日期，因为可能用户刚改了 offset 或刚过了分界点
+        # 比如：现在是 1月5日 02:00 (offset=4)，逻辑日期是 1月4日
+        # 如果记录是 1月5日 01:00，逻辑日期也是 1月4日 -> 匹配成功
         now = datetime.datetime.now()
-        current_logical_today = self.get_logical_date(now)
+        today = day_index(self.get_logical_date(now))
 
-        total = 0
-        for r in records:
-            if not isinstance(r, dict): continue # 防御性编程
-            
-            s_dt = datetime.datetime.strptime(r['start'], "%Y-%m-%d %H:%M:%S")
-            
-            # 判断这条记录的逻辑日期是否等于今天的逻辑日期
-            # 比如：现在是 1月5日 02:00 (offset=4)，逻辑日期是 1月4日
-            # 如果记录是 1月5日 01:00，逻辑日期也是 1月4日 -> 匹配成功
-            if self.get_logical_date(s_dt) == current_logical_today:
-                total += r['duration']
+        if not self.loaded.is_set():
+            # 还在加载：有尾部估算就先用它，否则只算进行中的这段
+            preview = self._preview_today
+            total = preview[1] if preview and preview[0] == today else 0
+        else:
+            entry = self._rollup_range(today, today).get(today)
+            total = entry[0] if entry else 0
+
+        if live_start is not None:
+            # 从昨天跨过分界点一直做到现在的，只算分界点之后的部分
+            boundary = from_epoch(today * 86400 + self._day_offset_seconds())
+            total += max((now - max(live_start, boundary)).total_seconds(), 0)
         return total
 
     # ===========================
@@ -170,56 +1495,311 @@ class DataManager:
             return (dt - datetime.timedelta(days=1)).date()
         return dt.date()
 
+    def _day_offset_seconds(self):
+        """逻辑日期 = (开始秒数 - 偏移秒数) // 86400"""
+        return self.get_setting("day_offset_hour", 4) * 3600
+
     # ===========================
-    # 报表数据接口 (保留原有逻辑，仅调整数据源)
+    # 逻辑日期索引
     # ===========================
+    @timed("aggregate.rebuild_index")
+    def _rebuild_index(self, use_cache=False, vectorize=None):
+        """
+        按逻辑日期排序的索引：_index_keys 为有序的逻辑日序号，_index_ids 为对应的记录下标
+        day_offset_hour 改变时必须重建
+        use_cache: 允许直接使用磁盘上仍然有效的统计缓存
+        vectorize: 是否用 NumPy 实现，None 时取 self.vectorize
+        """
+        if self.storage.queryable:
+            return  # 数据库自带索引
+        import aggregation
+        if vectorize is None:
+            vectorize = self.vectorize
+        if vectorize is None:
+            vectorize = aggregation.enabled()
+        if vectorize:
+            self._rebuild_index_vectorized(aggregation, use_cache)
+            return
+        shift = self._day_offset_seconds()
+        starts = self.store.starts
+        ids = sorted(range(len(starts)), key=starts.__getitem__)
+        self._index_ids = array('q', ids)
+        self._index_keys = array('q', [(starts[i] - shift) // 86400 for i in ids])
+
+        if use_cache and self._load_rollup():
+            self.rollup_source = "cache"
+            return
+
+        # 每个逻辑日的统计，"今日累计"和三个报表都直接查表；跨天的记录在这里拆开，查询时不再拆
+        self._rollup = {}
+        ends, durations = self.store.ends, self.store.durations
+        for i in ids:
+            self._rollup_add(starts[i], ends[i], durations[i], shift)
+        self.rollup_source = "python"
+        self.save_rollup()
+
+    def _rebuild_index_vectorized(self, aggregation, use_cache):
+        """同上，排序和按日统计在 NumPy 里整列完成 (百万条记录时快一个数量级以上)"""
+        shift = self._day_offset_seconds()
+        starts, ends, durations = aggregation.columns(self.store)
+        ids, keys = aggregation.build_index(starts, shift)
+        self._index_ids = array('q', ids.astype('int64').tobytes())
+        self._index_keys = array('q', keys.astype('int64').tobytes())
+
+        if use_cache and self._load_rollup():
+            self.rollup_source = "cache"
+            return
+        self._rollup = aggregation.daily_rollup(starts, ends, durations, shift)
+        self.rollup_source = "numpy"
+        self.save_rollup()
+
+    def _index_record(self, i):
+        """把新追加的第 i 条记录插入索引 (通常是按时间顺序追加，直接放到末尾)"""
+        start = self.store.starts[i]
+        shift = self._day_offset_seconds()
+        key = (start - shift) // 86400
+        self._rollup_add(start, self.store.ends[i], self.store.durations[i], shift)
+        self._rollup_dirty = True
+        if not self._index_keys or key >= self._index_keys[-1]:
+            self._index_keys.append(key)
+            self._index_ids.append(i)
+        else:
+            pos = bisect.bisect_right(self._index_keys, key)
+            self._index_keys.insert(pos, key)
+            self._index_ids.insert(pos, i)
+
+    def _index_range(self, first_day, last_day):
+        """二分查找逻辑日期落在 [first_day, last_day] 内的记录下标"""
+        lo = bisect.bisect_left(self._index_keys, first_day)
+        hi = bisect.bisect_right(self._index_keys, last_day, lo)
+        return self._index_ids[lo:hi]
+
+    def logical_date_range(self):
+        """最早和最晚一条记录的逻辑日期 (含归档)，没有记录时返回 None"""
+        with self._lock:
+            archives = list(self.archives.values())
+            if self.storage.queryable:
+                first, last = self.storage.day_range()
+            elif self._index_keys:
+                first, last = self._index_keys[0], self._index_keys[-1]
+            else:
+                first = last = None
+        ranges = [] if first is None else [(date_from_index(first), date_from_index(last))]
+        ranges += filter(None, (a.logical_date_range() for a in archives))
+        if not ranges:
+            return None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def get_records_in_range(self, first_date, last_date):
+        """获取逻辑日期在 [first_date, last_date] 内的记录 (含归档，按开始时间排序)"""
+        with self._lock:
+            archives = list(self.archives.values())
+            if self.storage.queryable:
+                records = self.storage.records_in_range(day_index(first_date), day_index(last_date))
+            else:
+                records = [self.store.get_record(i)
+                           for i in self._index_range(day_index(first_date), day_index(last_date))]
+        if archives:
+            for archive in archives:
+                records += archive.get_records_in_range(first_date, last_date)
+            # 时间字符串格式固定，按字符串排序即按时间排序
+            records.sort(key=lambda r: r["start"])
+        return records
+
+    # ===========================
+    # 按日预聚合的统计缓存 (Rollup)
+    # ===========================
+    def _rollup_entry(self, key):
+        entry = self._rollup.get(key)
+        if entry is None:
+            entry = self._rollup[key] = [0.0, 0, [0] * 24]
+        return entry
+
+    def _rollup_add(self, start, end, duration, shift):
+        """
+        把一条记录累加进按日统计 [总秒数, 条数, 开始小时分布]
+        条数和开始小时记在开始的那个逻辑日；时长按逻辑日分界点拆开，分别记到各自的逻辑日
+        """
+        entry = self._rollup_entry((start - shift) // 86400)
+        entry[1] += 1
+        entry[2][start // 3600 % 24] += 1
+        for day, seconds in split_by_logical_day(start, end, duration, shift):
+            self._rollup_entry(day)[0] += seconds
+
+    @timed("aggregate.rollup_range")
+    def _rollup_range(self, first_day, last_day):
+        """
+        逻辑日 [first_day, last_day] 内有记录的那些天的统计 {逻辑日: [总秒数, 条数, 开始小时分布]}
+        挂载了归档时把各文件的按日统计逐日相加 (各文件的统计都是现成的，不重新扫描记录)
+        """
+        with self._lock:
+            archives = list(self.archives.values())
+            own = self._own_rollup_range(first_day, last_day)
+        if not archives:
+            return own
+        days = {}
+        for part in [own] + [a._own_rollup_range(first_day, last_day) for a in archives]:
+            for key, (seconds, count, hours) in part.items():
+                entry = days.get(key)
+                if entry is None:
+                    days[key] = [seconds, count, list(hours)]
+                else:
+                    entry[0] += seconds
+                    entry[1] += count
+                    entry[2] = [a + b for a, b in zip(entry[2], hours)]
+        return days
+
+    def _own_rollup_range(self, first_day, last_day):
+        """只看本文件 (不含归档) 的按日统计"""
+        with self._lock:
+            if self.storage.queryable:
+                return self.storage.rollup_range(first_day, last_day)
+            days = {}
+            for key in range(first_day, last_day + 1):
+                entry = self._rollup.get(key)
+                if entry is not None:
+                    days[key] = entry
+            return days
+
+    def _data_fingerprint(self, paths=None):
+        """数据文件 (及日志) 的 [大小, 修改时间]，任何一个被改动过都会变化"""
+        parts = []
+        for path in paths or self.storage.files():
+            try:
+                st = os.stat(path)
+                parts.append([st.st_size, st.st_mtime_ns])
+            except OSError:
+                parts.append(None)
+        return parts
+
+    def _load_rollup(self):
+        """读取统计缓存，只有指纹、偏移量和记录数都吻合时才采用"""
+        try:
+            with open(self.rollup_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if (cache.get("version") != ROLLUP_VERSION
+                    or cache.get("fingerprint") != self._data_fingerprint()
+                    or cache.get("day_offset_hour") != self.get_setting("day_offset_hour", 4)
+                    or cache.get("records") != len(self.store)):
+                return False
+            self._rollup = {int(k): v for k, v in cache["days"].items()}
+        except Exception:
+            return False
+        self._rollup_dirty = False
+        return True
+
+    def save_rollup(self):
+        """把统计缓存连同当前数据文件指纹写盘 (启动重建后、日志合并后、退出时调用)"""
+        if self.storage.queryable:
+            return
+        with self._lock:
+            paths = self.storage.files()
+            cache = {
+                "version": ROLLUP_VERSION,
+                "day_offset_hour": self.get_setting("day_offset_hour", 4),
+                "records": len(self.store),
+                "days": {str(k): [v[0], v[1], list(v[2])] for k, v in self._rollup.items()},
+            }
+
+            def build_cache():
+                # 指纹要在排在前面的写入都完成之后再取
+                cache["fingerprint"] = self._data_fingerprint(paths)
+                return json.dumps(cache)
+
+            self._writer.submit_replace(self.rollup_file, build_cache)
+            self._rollup_dirty = False
+
+    def close(self):
+        """退出程序前调用：保存尚未写盘的统计缓存，并等待所有写入完成"""
+        if self._rollup_dirty:
+            self.save_rollup()
+        self._writer.flush()
+        with self._lock:
+            self.storage.close()
+            archives = list(self.archives.values())
+        for archive in archives:
+            archive.close()
+
+    # ===========================
+    # 报表数据接口 (保留原有逻辑，数据源改为列存储)
+    # ===========================
+    @timed("query.week")
     def get_week_stats(self, anchor_date):
         start_of_week = anchor_date - datetime.timedelta(days=anchor_date.weekday())
         end_of_week = start_of_week + datetime.timedelta(days=6)
+        first = day_index(start_of_week)
         
-        records = self.load_records()
         daily_hours = [0.0] * 7 
         start_hour_dist = [0] * 24
         
-        for r in records:
-            s_dt = datetime.datetime.strptime(r['start'], "%Y-%m-%d %H:%M:%S")
-            logical_date = self.get_logical_date(s_dt)
-            
-            if start_of_week <= logical_date <= end_of_week:
-                idx = (logical_date - start_of_week).days
-                if 0 <= idx <= 6:
-                    daily_hours[idx] += r['duration'] / 3600.0
-                start_hour_dist[s_dt.hour] += 1
+        for key, entry in self._rollup_range(first, first + 6).items():
+            daily_hours[key - first] = entry[0] / 3600.0
+            for h, c in enumerate(entry[2]):
+                start_hour_dist[h] += c
                 
         date_str = f"{start_of_week.strftime('%Y-%m-%d')} 至 {end_of_week.strftime('%Y-%m-%d')}"
         return daily_hours, start_hour_dist, date_str
 
+    @timed("query.month")
     def get_month_stats_heatmap(self, year, month):
-        records = self.load_records()
+        first = day_index(datetime.date(year, month, 1))
+        last = first + calendar.monthrange(year, month)[1] - 1
+
         month_data = {}
-        for r in records:
-            s_dt = datetime.datetime.strptime(r['start'], "%Y-%m-%d %H:%M:%S")
-            logical_date = self.get_logical_date(s_dt)
-            if logical_date.year == year and logical_date.month == month:
-                day = logical_date.day
-                month_data[day] = month_data.get(day, 0) + (r['duration'] / 3600.0)
+        for key, entry in sorted(self._rollup_range(first, last).items()):
+            month_data[key - first + 1] = entry[0] / 3600.0
         return month_data
 
+    @timed("query.year")
     def get_year_stats(self, year):
-        records = self.load_records()
         monthly_hours = [0.0] * 12
-        monthly_days_sets = [set() for _ in range(12)]
+        monthly_days = [0] * 12
         start_hour_dist = [0] * 24
         
-        for r in records:
-            s_dt = datetime.datetime.strptime(r['start'], "%Y-%m-%d %H:%M:%S")
-            logical_date = self.get_logical_date(s_dt)
-            
-            if logical_date.year == year:
-                m_idx = logical_date.month - 1
-                monthly_hours[m_idx] += r['duration'] / 3600.0
-                monthly_days_sets[m_idx].add(logical_date.day)
-                start_hour_dist[s_dt.hour] += 1
+        # 按天取统计，一年最多 366 个逻辑日，与历史记录总量无关
+        first = day_index(datetime.date(year, 1, 1))
+        last = day_index(datetime.date(year, 12, 31))
+        for key, entry in self._rollup_range(first, last).items():
+            m_idx = date_from_index(key).month - 1
+            monthly_hours[m_idx] += entry[0] / 3600.0
+            monthly_days[m_idx] += 1
+            for h, c in enumerate(entry[2]):
+                start_hour_dist[h] += c
                 
-        monthly_days = [len(s) for s in monthly_days_sets]
-        return monthly_hours, monthly_days, start_hour_dist
\ No newline at end of file
+        return monthly_hours, monthly_days, start_hour_dist
+
+    @timed("query.occupancy")
+    def get_hourly_occupancy(self, year):
+        """
+        全年 7 x 24 的时段占用 (小时)：行为逻辑日期的周一~周日，列为 0~23 点
+        与开始时间分布不同，一段 4 小时的工作会在它覆盖的 4 个小时格里各记 1 小时
+        """
+        first = day_index(datetime.date(year, 1, 1))
+        last = day_index(datetime.date(year, 12, 31))
+        shift = self._day_offset_seconds()
+        # 前一年末开始、跨进今年的记录也要算上它落在今年的部分
+        lookback = first - OCCUPANCY_LOOKBACK_DAYS
+        with self._lock:
+            archives = list(self.archives.values())
+            if self.storage.queryable:
+                intervals = self.storage.intervals_in_range(lookback, last)
+            else:
+                starts, ends = self.store.starts, self.store.ends
+                intervals = [(starts[i], ends[i]) for i in self._index_range(lookback, last)]
+        matrix = hourly_occupancy(intervals, shift, first, last)
+        # 归档的分界点与当前文件一致，各自的矩阵直接相加
+        for archive in archives:
+            for row, other in zip(matrix, archive.get_hourly_occupancy(year)):
+                for h, v in enumerate(other):
+                    row[h] += v
+        return matrix
+
+
+# 一次性导入：python data_manager.py work_data.json work_data.db
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        print("用法: python data_manager.py <源数据文件> <目标数据文件>")
+        sys.exit(1)
+    n = convert_data_file(sys.argv[1], sys.argv[2])
+    print(f"[成功] 已转换 {n} 条记录: {sys.argv[1]} -> {sys.argv[2]}")
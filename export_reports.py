@@ -0,0 +1,190 @@
+"""
+无界面批量导出报表：把日期范围内的每一周/月/年画成 PNG/SVG，并把统计数据写成 CSV
+直接复用 chart_engine 的图表类，在 Agg 后端离屏绘制，不创建任何 Tk 窗口，可以在没有显示器的机器上运行
+统计在主进程里查询 (按日预聚合，很快)，绘图分给进程池并行完成，每个进程每种视图只建一张图反复更新
+
+用法:
+    python export_reports.py                                      # 当前数据文件的全部历史，输出到 reports/
+    python export_reports.py --start 2024-01-01 --end 2025-12-31 --formats png svg -o archive
+    python export_reports.py --data other.wlb --views month --workers 8 --dpi 150
+    python export_reports.py --csv-only                           # 只导出 CSV
+"""
+import argparse
+import csv
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_manager import DataManager
+
+VIEWS = ("week", "month", "year")
+FIGSIZE = (8, 6)
+WEEKDAY_COLUMNS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+HOUR_COLUMNS = [f"h{h:02d}" for h in range(24)]
+
+
+# ===========================
+# 周期枚举
+# ===========================
+def iter_anchors(view, first, last):
+    """[first, last] 范围内每个周期的锚点：周一 / 每月1号 / 每年1月1号"""
+    if view == "week":
+        d = first - datetime.timedelta(days=first.weekday())
+        while d <= last:
+            yield d
+            d += datetime.timedelta(weeks=1)
+    elif view == "month":
+        y, m = first.year, first.month
+        while (y, m) <= (last.year, last.month):
+            yield datetime.date(y, m, 1)
+            y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    else:
+        for y in range(first.year, last.year + 1):
+            yield datetime.date(y, 1, 1)
+
+
+# ===========================
+# 统计 (主进程) -> 绘图参数 + CSV 行
+# ===========================
+def collect(db, view, anchor):
+    """返回 (图表 update 的参数, 图片标题, 文件名主干, CSV 行)"""
+    if view == "week":
+        daily_hours, start_dist, date_str = db.get_week_stats(anchor)
+        row = [anchor.isoformat(), (anchor + datetime.timedelta(days=6)).isoformat(),
+               round(sum(daily_hours), 3)] + [round(h, 3) for h in daily_hours] + list(start_dist)
+        return (daily_hours, start_dist), date_str, f"week_{anchor.isoformat()}", [row]
+    if view == "month":
+        data_map = db.get_month_stats_heatmap(anchor.year, anchor.month)
+        rows = [[datetime.date(anchor.year, anchor.month, day).isoformat(), round(hours, 3)]
+                for day, hours in sorted(data_map.items())]
+        title = f"{anchor.year}年 {anchor.month}月 工作概览"
+        return (anchor.year, anchor.month, data_map), title, f"month_{anchor:%Y-%m}", rows
+    m_hours, m_days, start_dist = db.get_year_stats(anchor.year)
+    row = ([anchor.year, round(sum(m_hours), 3), sum(m_days)] + [round(h, 3) for h in m_hours]
+           + list(m_days) + list(start_dist))
+    return (anchor.year, m_hours, m_days, start_dist), f"{anchor.year} 年度工作总结", f"year_{anchor.year}", [row]
+
+
+CSV_HEADERS = {
+    "week": ["week_start", "week_end", "total_hours"] + [f"{d}_hours" for d in WEEKDAY_COLUMNS] + HOUR_COLUMNS,
+    "month": ["date", "hours"],
+    "year": (["year", "total_hours", "total_days"] + [f"m{m:02d}_hours" for m in range(1, 13)]
+             + [f"m{m:02d}_days" for m in range(1, 13)] + HOUR_COLUMNS),
+}
+
+
+def write_csv(path, view, rows):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS[view])
+        writer.writerows(rows)
+
+
+# ===========================
+# 绘图 (工作进程)
+# ===========================
+_charts = {}    # 每个进程内：视图 -> 图表对象，反复 update 而不是每张图重建
+
+
+def _init_worker():
+    import chart_engine
+    chart_engine.use_headless()
+
+
+def _chart_for(view, dpi):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import chart_engine
+
+    chart = _charts.get(view)
+    if chart is None:
+        fig = Figure(figsize=FIGSIZE, dpi=dpi)
+        FigureCanvasAgg(fig)
+        cls = {"week": chart_engine.WeekChart, "month": chart_engine.MonthChart, "year": chart_engine.YearChart}[view]
+        chart = _charts[view] = cls(fig, use_blit=False)
+    return chart
+
+
+def render_job(job):
+    """job = (视图, 图表参数, 标题, 输出路径列表, dpi)；返回写出的文件数"""
+    view, args, title, paths, dpi = job
+    chart = _chart_for(view, dpi)
+    chart.update(*args)
+    chart.fig.suptitle(title, fontsize=12, weight='bold')
+    for path in paths:
+        chart.fig.savefig(path, dpi=dpi)
+    return len(paths)
+
+
+# ===========================
+# 入口
+# ===========================
+def export_reports(db, out_dir, first=None, last=None, views=VIEWS, formats=("png",), workers=None,
+                   dpi=100, csv_only=False):
+    """
+    导出 [first, last] (逻辑日期，默认覆盖全部数据) 内的报表，返回 {视图: 周期数}
+    workers: 绘图进程数，默认 CPU 核数；1 表示在当前进程里画
+    """
+    if first is None or last is None:
+        today = datetime.date.today()
+        data_first, data_last = db.logical_date_range() or (today, today)
+        first, last = first or data_first, last or data_last
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs, counts = [], {}
+    for view in views:
+        rows = []
+        anchors = list(iter_anchors(view, first, last))
+        for anchor in anchors:
+            args, title, stem, view_rows = collect(db, view, anchor)
+            rows += view_rows
+            if not csv_only:
+                paths = [os.path.join(out_dir, f"{stem}.{fmt}") for fmt in formats]
+                jobs.append((view, args, title, paths, dpi))
+        write_csv(os.path.join(out_dir, f"{view}.csv"), view, rows)
+        counts[view] = len(anchors)
+
+    if jobs:
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) == 1:
+            _init_worker()
+            for job in jobs:
+                render_job(job)
+        else:
+            # 同一视图的任务排在一起，按块分给进程，各进程里的图表对象能被多次复用
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                for _ in pool.map(render_job, jobs, chunksize=chunksize):
+                    pass
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面批量导出 WorkLogger 报表 (PNG/SVG + CSV)")
+    parser.add_argument("--data", help="数据文件 (默认使用 pathCfg.json 指向的文件)")
+    parser.add_argument("-o", "--output", default="reports", help="输出目录")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="起始日期 YYYY-MM-DD，默认最早的记录")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="结束日期，默认最晚的记录")
+    parser.add_argument("--views", nargs="+", choices=VIEWS, default=list(VIEWS))
+    parser.add_argument("--formats", nargs="+", choices=["png", "svg"], default=["png"])
+    parser.add_argument("--workers", type=int, help="绘图进程数，默认 CPU 核数")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--csv-only", action="store_true", help="只写 CSV，不画图")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    # 指定 --data 时不读也不改 pathCfg.json；主程序可能正在运行，不去动它的进行中检查点
+    db = DataManager(data_file=args.data, recover_session=False)
+    try:
+        counts = export_reports(db, args.output, args.start, args.end, args.views, args.formats,
+                                args.workers, args.dpi, args.csv_only)
+    finally:
+        db.close()
+
+    summary = ", ".join(f"{view} {n}" for view, n in counts.items())
+    print(f"[成功] 已导出到 {os.path.abspath(args.output)}: {summary} ({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,21 @@ from tkinter import ttk, messagebox, filedialog
 import datetime
 import threading
 import sys
-import json
 import os
+import time
+import math
 from PIL import Image, ImageDraw
 import pystray
 
-from data_manager import DataManager
-from chart_engine import ReportWindow
+from data_manager import DataManager, BINARY_EXTENSION, SQLITE_EXTENSIONS, SESSION_CHECKPOINT_SECONDS
+from profiler import PROFILER
+
+# 数据文件可选格式：扩展名决定存储后端
+DATA_FILETYPES = [
+    ("JSON Files", "*.json"),
+    ("二进制数据文件", f"*{BINARY_EXTENSION}"),
+    ("SQLite 数据库", " ".join(f"*{ext}" for ext in SQLITE_EXTENSIONS)),
+]
 
 class MainApp:
     def __init__(self, root):
@@ -19,20 +27,31 @@ class MainApp:
         self.root.geometry("400x520")
         self.root.resizable(False, True)
         
-        # 1. 加载数据管理器
-        self.db = DataManager()
+        self._t_launch = time.perf_counter()
+
+        # 1. 数据管理器：这里只定位数据文件，真正的读取放到后台线程，窗口先显示出来
+        self.db = DataManager(autoload=False)
         
         # 2. 状态变量
         self.is_working = False
         self.start_time = None
         self.pomo_running = False
-        self.pomo_remaining = 0
+        self.pomo_deadline = 0.0   # 番茄钟结束时刻 (time.monotonic)
+        # 统一的秒级刷新任务；窗口缩到托盘时不刷新界面
+        self._tick_job = None
+        self._hidden = False
+        # 进行中工作的定期检查点 (防止程序被强行结束时丢掉整段工作)
+        self._checkpoint_job = None
+        # 报表窗口只创建一次，关闭后隐藏复用
+        self.report_window = None
         
         self._setup_ui()
         self._setup_tray()
         
-        # 启动时刷新一次今日时长
-        self.update_today_total()
+        # 后台加载数据，完成后刷新今日时长并开放报表入口
+        threading.Thread(target=self._load_data, daemon=True).start()
+        self.root.after(50, self._poll_data_loaded)
+        self.root.after_idle(self._report_first_window)
         
         # 拦截关闭事件 -> 最小化
         self.root.protocol("WM_DELETE_WINDOW", self.hide_window)
@@ -45,12 +64,14 @@ class MainApp:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="选项", menu=file_menu)
         file_menu.add_command(label="⚙️ 设置 (路径/习惯)", command=self.open_settings_window)
+        file_menu.add_command(label="🩺 性能诊断", command=self.open_diagnostics_window)
         #file_menu.add_separator()
         #file_menu.add_command(label="退出程序", command=self.quit_app)
 
         stats_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="统计", menu=stats_menu)
-        stats_menu.add_command(label="打开可视化报表", command=self.open_report)
+        stats_menu.add_command(label="打开可视化报表", command=self.open_report, state="disabled")
+        self.stats_menu = stats_menu
 
         # --- 样式配置 ---
         style = ttk.Style()
@@ -71,7 +92,7 @@ class MainApp:
         self.lbl_status = ttk.Label(frame_work, text="当前状态: 空闲", style="Status.TLabel", anchor="center")
         self.lbl_status.pack(fill='x', pady=(0, 5))
 
-        self.lbl_today = ttk.Label(frame_work, text="今日累计: 0 h 0 min", style="Info.TLabel", anchor="center")
+        self.lbl_today = ttk.Label(frame_work, text="今日累计: 数据加载中...", style="Info.TLabel", anchor="center")
         self.lbl_today.pack(fill='x', pady=(0, 10))
         
         self.btn_work = ttk.Button(frame_work, text="开始工作", style="Action.TButton", command=self.toggle_work)
@@ -115,6 +136,47 @@ class MainApp:
         btn_quit.pack(side="right", anchor="center")
 
 
+    # ===========================
+    # 启动加载
+    # ===========================
+    def _record_startup(self, name):
+        """从启动到现在的耗时记入性能诊断 (只在开启计时时记录)"""
+        if PROFILER.enabled:
+            PROFILER.record(name, (time.perf_counter() - self._t_launch) * 1000)
+
+    def _report_first_window(self):
+        self._record_startup("startup.window_shown")
+
+    def _load_data(self):
+        """后台线程：异常已记在 db.load_error，由 _poll_data_loaded 在主线程提示"""
+        try:
+            self.db.load()
+        except Exception:
+            pass
+
+    def _poll_data_loaded(self):
+        """主线程轮询后台加载是否完成 (Tk 控件只能在主线程更新)"""
+        if not self.db.loaded.is_set():
+            # 加载期间先显示根据文件末尾估算的今日累计和解析进度
+            self.update_today_total()
+            self.root.after(50, self._poll_data_loaded)
+            return
+
+        if self.db.load_error is not None:
+            self.update_today_total()
+            messagebox.showerror("数据加载失败",
+                                 f"无法读取数据文件:\n{self.db.data_file}\n\n{self.db.load_error}\n\n"
+                                 "本次记录无法保存，请在【选项 -> 设置】中修改数据文件路径。")
+            return
+
+        self._record_startup("startup.data_loaded")
+
+        # 番茄钟时长在加载前显示的是默认值，这里换成文件里的设置
+        if not self.pomo_running:
+            self.var_pomo_mins.set(self.db.get_setting("pomodoro_duration", 25))
+        self.stats_menu.entryconfig(0, state="normal")
+        self.update_today_total()
+
     # ===========================
     # 设置面板逻辑
     # ===========================
@@ -122,7 +184,7 @@ class MainApp:
         """打开设置窗口 (路径设置与习惯设置分离)"""
         sw = tk.Toplevel(self.root)
         sw.title("程序设置")
-        sw.geometry("520x300")
+        sw.geometry("520x480")
         sw.resizable(False, False)
         sw.grab_set()
 
@@ -137,9 +199,51 @@ class MainApp:
 
         btn_change = tk.Button(lf_path, text="📂 修改/新建 数据文件路径...", 
                                command=lambda: self.change_data_path_logic(sw, lbl_path_val))
-        btn_change.pack(anchor="w")
+        btn_change.pack(side="left")
+
+        btn_export = tk.Button(lf_path, text="💾 导出副本 (JSON/二进制/SQLite)...",
+                               command=lambda: self.export_data_logic(sw))
+        btn_export.pack(side="left", padx=10)
+
+        # --- 区域2: 只读归档 ---
+        lf_archive = tk.LabelFrame(sw, text="归档数据文件 (只读，统计报表时与当前数据合并)", padx=15, pady=10)
+        lf_archive.pack(fill="x", padx=15, pady=(0, 15))
+
+        lst_archive = tk.Listbox(lf_archive, height=4)
+        lst_archive.pack(fill="x", pady=(0, 8))
+
+        def refresh_archives():
+            lst_archive.delete(0, "end")
+            for path in self.db.archive_paths:
+                lst_archive.insert("end", path if path in self.db.archives else f"{path}  (未能载入)")
+
+        def add_archive():
+            path = filedialog.askopenfilename(parent=sw, title="选择要挂载的归档数据文件",
+                                              initialdir=os.path.dirname(self.db.data_file),
+                                              filetypes=DATA_FILETYPES)
+            if not path:
+                return
+            try:
+                self.db.mount_archive(path)
+            except (ValueError, RuntimeError) as e:
+                messagebox.showerror("失败", f"挂载归档失败:\n{e}", parent=sw)
+                return
+            refresh_archives()
+            self.update_today_total()
 
-        # --- 区域2: 个人习惯 ---
+        def remove_archive():
+            sel = lst_archive.curselection()
+            if not sel:
+                return
+            self.db.unmount_archive(self.db.archive_paths[sel[0]])
+            refresh_archives()
+            self.update_today_total()
+
+        tk.Button(lf_archive, text="➕ 挂载归档...", command=add_archive).pack(side="left")
+        tk.Button(lf_archive, text="➖ 移除选中", command=remove_archive).pack(side="left", padx=10)
+        refresh_archives()
+
+        # --- 区域3: 个人习惯 ---
         lf_pref = tk.LabelFrame(sw, text="个人习惯", padx=15, pady=15)
         lf_pref.pack(fill="x", padx=15, pady=(0, 15))
 
@@ -163,6 +267,8 @@ class MainApp:
                 messagebox.showinfo("已保存", "【个人习惯】设置已更新。")
             except ValueError:
                 messagebox.showerror("错误", "请输入有效数字")
+            except RuntimeError as e:
+                messagebox.showerror("错误", str(e), parent=sw)
 
         btn_save_habit = ttk.Button(f_offset, text="保存", command=save_habit, width=5)
         btn_save_habit.pack(side="left", padx=5)
@@ -180,7 +286,7 @@ class MainApp:
             defaultextension=".json",
             initialfile="work_data.json",
             confirmoverwrite=False,
-            filetypes=[("JSON Files", "*.json")]
+            filetypes=DATA_FILETYPES
         )
         
         if not new_path:
@@ -194,21 +300,18 @@ class MainApp:
                 is_new_file = True
             
             if is_new_file:
-                ans = messagebox.askyesno(
+                # 当前数据文件没能载入时没有可复制的记录，直接建空数据库
+                ans = self.db.load_error is None and messagebox.askyesno(
                     "创建新库", 
                     "目标是新文件。\n是否将【当前已有的记录和设置】复制过去？\n\n(选择'否'将创建一个全新的空数据库)",
                     parent=parent_window
                 )
-                if ans:
-                    with open(new_path, 'w', encoding='utf-8') as f:
-                        json.dump(self.db.full_data, f, indent=4)
-                else:
-                    with open(new_path, 'w', encoding='utf-8') as f:
-                        empty_data = {"settings": self.db.full_data.get("settings", {}), "records": []}
-                        json.dump(empty_data, f, indent=4)
+                # 按新文件的扩展名写成对应格式 (.json / .wlb)
+                self.db.export_to(new_path, include_records=ans)
             
             self.db.save_local_pointer(new_path)
             label_widget.config(text=new_path)
+            self.stats_menu.entryconfig(0, state="normal")
             self.update_today_total()
             
             msg = "路径设置成功。" + ("\n(已初始化新文件)" if is_new_file else "\n(已切换至现有数据文件)")
@@ -217,15 +320,125 @@ class MainApp:
         except Exception as e:
             messagebox.showerror("失败", f"设置路径失败:\n{e}", parent=parent_window)
 
+    def export_data_logic(self, parent_window):
+        """把当前数据导出为另一种格式的副本，不切换当前数据文件"""
+        export_path = filedialog.asksaveasfilename(
+            parent=parent_window,
+            title="导出数据副本 (扩展名决定格式)",
+            initialdir=os.path.dirname(self.db.data_file),
+            defaultextension=".json",
+            initialfile="work_data_export.json",
+            filetypes=DATA_FILETYPES
+        )
+        if not export_path:
+            return
+        if os.path.abspath(export_path) == os.path.abspath(self.db.data_file):
+            messagebox.showerror("失败", "不能导出到当前正在使用的数据文件", parent=parent_window)
+            return
+
+        try:
+            self.db.export_to(export_path)
+            messagebox.showinfo("成功", f"已导出到:\n{export_path}", parent=parent_window)
+        except Exception as e:
+            messagebox.showerror("失败", f"导出失败:\n{e}", parent=parent_window)
+
+    # ===========================
+    # 性能诊断面板
+    # ===========================
+    def open_diagnostics_window(self):
+        """查看各热点路径的计时统计，可导出 JSON 或录制 cProfile"""
+        dw = tk.Toplevel(self.root)
+        dw.title("性能诊断")
+        dw.geometry("720x420")
+
+        f_top = tk.Frame(dw)
+        f_top.pack(fill="x", padx=10, pady=(10, 5))
+
+        var_enabled = tk.BooleanVar(value=PROFILER.enabled)
+
+        def toggle_enabled():
+            PROFILER.enabled = var_enabled.get()
+
+        tk.Checkbutton(f_top, text="启用计时 (启动时设置 WORKLOG_PROFILE=1 可从一开始记录)",
+                       variable=var_enabled, command=toggle_enabled).pack(side="left")
+
+        columns = ("count", "mean", "p50", "p95", "max", "total")
+        headings = ("次数", "平均 ms", "P50 ms", "P95 ms", "最大 ms", "合计 ms")
+        tree = ttk.Treeview(dw, columns=columns, height=12)
+        tree.heading("#0", text="计时项")
+        tree.column("#0", width=200)
+        for col, text in zip(columns, headings):
+            tree.heading(col, text=text)
+            tree.column(col, width=80, anchor="e")
+        tree.pack(fill="both", expand=True, padx=10)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for name, st in PROFILER.snapshot().items():
+                tree.insert("", "end", text=name, values=(
+                    st["count"], f"{st['mean_ms']:.2f}", f"{st['p50_ms']:.2f}", f"{st['p95_ms']:.2f}",
+                    f"{st['max_ms']:.2f}", f"{st['total_ms']:.0f}"))
+
+        def auto_refresh():
+            if dw.winfo_exists():
+                refresh()
+                dw.after(1000, auto_refresh)
+
+        def reset():
+            PROFILER.reset()
+            refresh()
+
+        def export_json():
+            path = filedialog.asksaveasfilename(parent=dw, title="导出计时统计", defaultextension=".json",
+                                                initialfile="worklog_profile.json",
+                                                filetypes=[("JSON Files", "*.json")])
+            if path:
+                try:
+                    PROFILER.dump_json(path)
+                except OSError as e:
+                    messagebox.showerror("失败", f"导出失败:\n{e}", parent=dw)
+
+        def toggle_cprofile():
+            if not PROFILER.cprofile_running:
+                PROFILER.start_cprofile()
+                btn_cprofile.config(text="⏹ 停止并保存 cProfile...")
+                return
+            path = filedialog.asksaveasfilename(parent=dw, title="保存 cProfile 结果", defaultextension=".prof",
+                                                initialfile="worklog.prof",
+                                                filetypes=[("cProfile", "*.prof")])
+            # 取消保存也停止录制，避免一直拖慢主线程
+            try:
+                PROFILER.stop_cprofile(path or os.devnull)
+            except OSError as e:
+                messagebox.showerror("失败", f"保存失败:\n{e}", parent=dw)
+            btn_cprofile.config(text="⏺ 开始录制 cProfile (主线程)")
+
+        f_btn = tk.Frame(dw)
+        f_btn.pack(fill="x", padx=10, pady=10)
+        ttk.Button(f_btn, text="清零", command=reset).pack(side="left")
+        ttk.Button(f_btn, text="导出 JSON...", command=export_json).pack(side="left", padx=10)
+        btn_cprofile = ttk.Button(f_btn, command=toggle_cprofile, text=(
+            "⏹ 停止并保存 cProfile..." if PROFILER.cprofile_running else "⏺ 开始录制 cProfile (主线程)"))
+        btn_cprofile.pack(side="left")
+        ttk.Button(f_btn, text="关闭", command=dw.destroy).pack(side="right")
+
+        auto_refresh()
+
     # ===========================
     # 核心工作逻辑
     # ===========================
     def update_today_total(self):
-        """刷新今日累计时长"""
-        total_sec = self.db.get_today_total_seconds()
+        """刷新今日累计时长 (包含正在进行中的这段工作)"""
+        live_start = self.start_time if self.is_working else None
+        total_sec = self.db.get_today_total_seconds(live_start)
         m, s = divmod(total_sec, 60)
         h, m = divmod(m, 60)
-        self.lbl_today.config(text=f"今日累计: {int(h)} h {int(m)} min")
+        text = f"今日累计: {int(h)} h {int(m)} min"
+        if not self.db.loaded.is_set():
+            text += f" (加载中 {self.db.load_progress:.0%})"
+        elif self.db.load_error is not None:
+            text += " (数据文件载入失败)"
+        self.lbl_today.config(text=text)
 
     def toggle_work(self):
         if not self.is_working:
@@ -233,7 +446,9 @@ class MainApp:
             self.start_time = datetime.datetime.now()
             self.btn_work.config(text="停止工作")
             self.lbl_status.config(text=f"工作中 (自 {self.start_time.strftime('%H:%M')})", foreground="#4CAF50")
-            self._run_work_timer()
+            self._refresh_clocks()
+            self._schedule_tick()
+            self._checkpoint_session()
         else:
             self.stop_and_save()
 
@@ -241,20 +456,74 @@ class MainApp:
         if self.is_working:
             self.is_working = False
             end_time = datetime.datetime.now()
-            self.db.save_record(self.start_time, end_time)
+            try:
+                self.db.save_record(self.start_time, end_time)
+            except RuntimeError as e:
+                # 数据文件没载入：检查点留着，换好数据文件或下次启动时补存
+                messagebox.showerror("保存失败", str(e))
+            else:
+                self.db.clear_session()
+            if self._checkpoint_job is not None:
+                self.root.after_cancel(self._checkpoint_job)
+                self._checkpoint_job = None
             self.btn_work.config(text="开始工作")
             self.lbl_status.config(text="已停止，记录已保存", foreground="#666")
             self.lbl_timer.config(text="00:00:00")
             self.update_today_total()
 
-    def _run_work_timer(self):
+    def _checkpoint_session(self):
+        """每隔几分钟把进行中的工作写进检查点 (只有几十字节，不重写数据文件)"""
+        self._checkpoint_job = None
         if self.is_working:
-            delta = datetime.datetime.now() - self.start_time
-            total_seconds = int(delta.total_seconds())
+            self.db.checkpoint_session(self.start_time)
+            self._checkpoint_job = self.root.after(SESSION_CHECKPOINT_SECONDS * 1000, self._checkpoint_session)
+
+    # ===========================
+    # 计时调度
+    # ===========================
+    def _schedule_tick(self):
+        """
+        安排下一次刷新：对齐到下一个整秒；番茄钟快到点时提前到结束时刻
+        窗口隐藏时不刷新界面，只在番茄钟结束时醒来一次
+        """
+        if self._tick_job is not None:
+            self.root.after_cancel(self._tick_job)
+            self._tick_job = None
+
+        pomo_left = self.pomo_deadline - time.monotonic() if self.pomo_running else None
+        if self._hidden:
+            if pomo_left is None:
+                return
+            delay = pomo_left
+        elif self.is_working or self.pomo_running:
+            delay = 1 - time.time() % 1
+            if pomo_left is not None:
+                delay = min(delay, pomo_left)
+        else:
+            return
+        self._tick_job = self.root.after(max(int(delay * 1000) + 1, 1), self._tick)
+
+    def _tick(self):
+        self._tick_job = None
+        if self.pomo_running and time.monotonic() >= self.pomo_deadline:
+            self.stop_pomo(completed=True)
+        if not self._hidden:
+            self._refresh_clocks()
+        self._schedule_tick()
+
+    def _refresh_clocks(self):
+        """按当前时间重新计算各个显示，不依赖回调次数，卡顿或休眠后也不会走偏"""
+        if self.is_working:
+            total_seconds = int((datetime.datetime.now() - self.start_time).total_seconds())
             h, rem = divmod(total_seconds, 3600)
             m, s = divmod(rem, 60)
             self.lbl_timer.config(text=f"{h:02d}:{m:02d}:{s:02d}")
-            self.root.after(1000, self._run_work_timer)
+            # 今日累计是查表得到的，跟着每秒刷新也不会扫描历史记录
+            self.update_today_total()
+        if self.pomo_running:
+            remaining = max(math.ceil(self.pomo_deadline - time.monotonic()), 0)
+            m, s = divmod(remaining, 60)
+            self.lbl_pomo_timer.config(text=f"{m:02d}:{s:02d}", foreground="#FF5722")
 
     # ===========================
     # 番茄钟逻辑
@@ -267,11 +536,12 @@ class MainApp:
                 mins = int(self.var_pomo_mins.get())
             except:
                 mins = 25
-            self.pomo_remaining = mins * 60
+            self.pomo_deadline = time.monotonic() + mins * 60
             self.pomo_running = True
             self.btn_pomo.config(text="取消")
             self.spin_pomo.config(state='disabled')
-            self._run_pomo_timer()
+            self._refresh_clocks()
+            self._schedule_tick()
         else:
             self.stop_pomo(completed=False)
 
@@ -281,27 +551,23 @@ class MainApp:
         self.spin_pomo.config(state='normal')
         if completed:
             self.lbl_pomo_timer.config(text="完成!", foreground="#4CAF50")
-            self.root.deiconify()
+            self._restore_window()
             self.root.attributes("-topmost", True)
             messagebox.showinfo("番茄钟", "专注时间结束！休息一下！")
             self.root.attributes("-topmost", False)
         else:
             self.lbl_pomo_timer.config(text="00:00", foreground="#888")
 
-    def _run_pomo_timer(self):
-        if self.pomo_running and self.pomo_remaining > 0:
-            self.pomo_remaining -= 1
-            m, s = divmod(self.pomo_remaining, 60)
-            self.lbl_pomo_timer.config(text=f"{m:02d}:{s:02d}", foreground="#FF5722")
-            self.root.after(1000, self._run_pomo_timer)
-        elif self.pomo_running and self.pomo_remaining <= 0:
-            self.stop_pomo(completed=True)
-
     # ===========================
     # 辅助与托盘
     # ===========================
     def open_report(self):
-        ReportWindow(self.root, self.db)
+        # matplotlib 只在第一次打开报表时导入，不拖慢程序启动
+        from chart_engine import ReportWindow
+        if self.report_window is None or not self.report_window.winfo_exists():
+            self.report_window = ReportWindow(self.root, self.db)
+        else:
+            self.report_window.show()
 
     def create_icon(self):
         image = Image.new('RGB', (64, 64), color=(76, 175, 80))
@@ -320,15 +586,30 @@ class MainApp:
 
     def hide_window(self):
         self.root.withdraw()
+        self._hidden = True
+        self._schedule_tick()
 
     def show_window(self, icon=None, item=None):
-        self.root.after(0, self.root.deiconify)
+        self.root.after(0, self._restore_window)
+
+    def _restore_window(self):
+        """从托盘恢复：先补一次刷新，再恢复秒级调度"""
+        self.root.deiconify()
+        if self._hidden:
+            self._hidden = False
+            self._refresh_clocks()
+            self._schedule_tick()
 
     def quit_app(self, icon=None, item=None):
         """完全退出程序"""
         if self.is_working:
             end_time = datetime.datetime.now()
-            self.db.save_record(self.start_time, end_time)
+            try:
+                self.db.save_record(self.start_time, end_time)
+                self.db.clear_session()
+            except RuntimeError as e:
+                print(e)
+        self.db.close()
         
         if hasattr(self, 'icon'):
             self.icon.stop()
@@ -340,6 +621,8 @@ class MainApp:
     def _perform_exit(self):
         """【新增函数】执行最终的销毁操作"""
         # 这个函数由主线程执行，安全销毁窗口
+        # 退出前确认后台写盘队列已经清空
+        self.db.flush()
         self.root.destroy()
         sys.exit(0)
 
@@ -0,0 +1,154 @@
+"""
+可选的性能计时：给加载、写盘、统计查询、报表刷新和画布绘制这些热点路径计次、计时并统计耗时分布
+默认关闭 (被包装的函数只多一次布尔判断)；设置环境变量 WORKLOG_PROFILE=1 启动即开启，也可以在"选项 -> 性能诊断"里开关
+结果可以导出为 JSON；另外可以用 cProfile 录一段主线程的完整调用剖析 (.prof，可用 snakeviz / pstats 查看)
+
+计时项按前缀分类，便于判断慢在哪一层:
+    startup.*   从程序启动到主窗口显示 / 数据载入完成
+    load.*      读取并解析数据文件
+    io.*        保存一条记录 (前台) 与后台写盘队列的整文件替换 / 追加 / 其他写操作
+    aggregate.* 重建索引与按日统计
+    query.*     统计查询
+    report.*    报表页刷新 (含查询 + 更新图表)
+    render.*    matplotlib 绘制
+"""
+import bisect
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方图的桶上界 (毫秒)，最后一个桶收集更慢的
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class TimerStats:
+    """一个计时项：次数、总耗时、最小/最大值和耗时分布直方图"""
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+
+    def percentile(self, q):
+        """由直方图估算分位数 (取所在桶的上界，最慢的桶用最大值)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(HISTOGRAM_BOUNDS_MS[i], self.max_ms) if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        histogram = {f"<={b}": n for b, n in zip(HISTOGRAM_BOUNDS_MS, self.buckets)}
+        histogram[f">{HISTOGRAM_BOUNDS_MS[-1]}"] = self.buckets[-1]
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "min_ms": self.min_ms if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "histogram": histogram,
+        }
+
+
+class Profiler:
+    """
+    全局计时器 (模块级单例 PROFILER)
+    后台加载、写盘、预取线程也会记录，所以累加时加锁；关闭时不加锁也不取时间
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._cprofile = None
+
+    def record(self, name, ms):
+        with self._lock:
+            stats = self._timers.get(name)
+            if stats is None:
+                stats = self._timers[name] = TimerStats()
+            stats.add(ms)
+
+    def reset(self):
+        with self._lock:
+            self._timers = {}
+
+    def snapshot(self):
+        """{计时项: 统计字典}，按名称排序"""
+        with self._lock:
+            return {name: self._timers[name].to_dict() for name in sorted(self._timers)}
+
+    def timed(self, name):
+        """装饰器：开启时记录每次调用的耗时"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, (time.perf_counter() - t0) * 1000)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def span(self, name):
+        """with 语句版本，用于一段代码而不是整个函数"""
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000)
+
+    def dump_json(self, path):
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pid": os.getpid(),
+            "timers": self.snapshot(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    # --- cProfile (只覆盖调用 start 的线程，通常是 Tk 主线程) ---
+    @property
+    def cprofile_running(self):
+        return self._cprofile is not None
+
+    def start_cprofile(self):
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop_cprofile(self, path):
+        """停止剖析并写成 .prof 文件 (pstats 格式)"""
+        prof, self._cprofile = self._cprofile, None
+        if prof is not None:
+            prof.disable()
+            prof.dump_stats(path)
+
+
+PROFILER = Profiler(enabled=os.environ.get("WORKLOG_PROFILE", "") not in ("", "0"))
+timed = PROFILER.timed
+span = PROFILER.span
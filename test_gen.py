@@ -1,66 +1,153 @@
+"""
+测试数据生成器：可复现 (固定种子)，边生成边写文件，可以直接产出几百万条记录的 JSON / 二进制 / SQLite 数据文件
+
+用法:
+    python test_gen.py                                   # 最近 14 天，每天 2-4 条，写 work_data.json 并更新 pathCfg.json
+    python test_gen.py --days 365 --sessions 3-8 --seed 42 -o big.wlb
+    python test_gen.py --records 1000000 -o million.db --no-pointer
+    python test_gen.py --cross-midnight 0.3 --offset-edge 0.3 --day-offset 4   # 多造跨天/分界点附近的边界数据
+"""
+import argparse
+import datetime
+import itertools
 import json
+import math
 import os
-import datetime
 import random
+import time
+
+from data_manager import DEFAULT_DATA_STRUCTURE, LOCAL_POINTER_FILE, storage_class_for, to_epoch
+
+# 普通记录的开始时间范围：早上 9 点 ~ 晚上 10 点
+DAY_START_HOUR = 9
+DAY_END_HOUR = 22
+
+
+def parse_range(text):
+    """'2-4' -> (2, 4)；'3' -> (3, 3)"""
+    low, _, high = text.partition("-")
+    low = int(low)
+    high = int(high) if high else low
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"无效的范围: {text}")
+    return low, high
+
+
+def sessions_for_day(rng, sessions, distribution):
+    low, high = sessions
+    if distribution == "poisson":
+        # 均值取区间中点；Knuth 算法，均值不大时足够快
+        limit, k, p = math.exp(-(low + high) / 2), 0, rng.random()
+        while p > limit:
+            k += 1
+            p *= rng.random()
+        return k
+    return rng.randint(low, high)
+
+
+def iter_sessions(first_day, last_day=None, seed=0, sessions=(2, 4), distribution="uniform",
+                  minutes=(25, 120), cross_midnight=0.1, offset_edge=0.05, day_offset=4):
+    """
+    按时间顺序逐条产出 (开始秒数, 结束秒数, 时长)
+    cross_midnight: 每条记录是"深夜开始、跨过零点"的概率
+    offset_edge:    每条记录落在"新一天分界点 (day_offset 点) 前后一小时内开始"的概率
+    last_day 为 None 时一直生成下去 (由调用方截断)
+    """
+    rng = random.Random(seed)
+    day = first_day
+    while last_day is None or day <= last_day:
+        midnight = to_epoch(datetime.datetime.combine(day, datetime.time()))
+        starts = []
+        for _ in range(sessions_for_day(rng, sessions, distribution)):
+            roll = rng.random()
+            if roll < cross_midnight:
+                offset = rng.randint(23 * 3600, 24 * 3600 - 60)           # 23:00 ~ 23:59，大多会跨过零点
+            elif roll < cross_midnight + offset_edge:
+                offset = 86400 + day_offset * 3600 + rng.randint(-3600, 3599)  # 次日分界点前后一小时
+            else:
+                offset = rng.randint(DAY_START_HOUR * 3600, DAY_END_HOUR * 3600)
+            starts.append(midnight + offset)
+        for start in sorted(starts):
+            duration = rng.randint(minutes[0], minutes[1]) * 60
+            yield start, start + duration, float(duration)
+        day += datetime.timedelta(days=1)
+
+
+def generate_mock_data(path="work_data.json", days=14, end=None, start=None, records=None, seed=0,
+                       sessions=(2, 4), distribution="uniform", minutes=(25, 120),
+                       cross_midnight=0.1, offset_edge=0.05, day_offset=4, write_pointer=True):
+    """生成数据文件 (格式由扩展名决定)，返回写入的记录条数"""
+    end = end or datetime.date.today()
+    if records is not None and sum(sessions) == 0:
+        # 每天 0 条时永远凑不够条数
+        raise ValueError("按总条数生成时，每天条数范围不能是 0")
+    if records is not None:
+        # 按平均每天条数往前推出起始日期，生成到够数为止
+        per_day = max((sessions[0] + sessions[1]) / 2, 0.1)
+        start = end - datetime.timedelta(days=math.ceil(records / per_day))
+        last_day = None
+    else:
+        start = start or end - datetime.timedelta(days=days)
+        last_day = end
+
+    rows = iter_sessions(start, last_day, seed=seed, sessions=sessions, distribution=distribution,
+                         minutes=minutes, cross_midnight=cross_midnight, offset_edge=offset_edge,
+                         day_offset=day_offset)
+    if records is not None:
+        rows = itertools.islice(rows, records)
+
+    counter = itertools.count()
+    counted = ((st, en, du) for (st, en, du), _ in zip(rows, counter))
+    settings = dict(DEFAULT_DATA_STRUCTURE["settings"], day_offset_hour=day_offset)
+
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    storage_class_for(path).write_rows(path, settings, counted)
+    total = next(counter)
+
+    if write_pointer:
+        abs_path = os.path.abspath(path)
+        with open(LOCAL_POINTER_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"data_path": abs_path}, f, indent=4)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 WorkLogger 测试数据")
+    parser.add_argument("-o", "--output", default="work_data.json",
+                        help="输出文件，扩展名决定格式 (.json / .wlb / .db)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子 (相同参数+种子生成完全相同的数据)")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="结束日期，默认今天")
+    parser.add_argument("--days", type=int, default=14, help="未指定 --start 时往前生成的天数")
+    parser.add_argument("--records", type=int, help="按总条数生成 (忽略 --start/--days)")
+    parser.add_argument("--sessions", type=parse_range, default=(2, 4), help="每天条数范围，如 2-4")
+    parser.add_argument("--distribution", choices=["uniform", "poisson"], default="uniform",
+                        help="每天条数的分布 (poisson 以范围中点为均值)")
+    parser.add_argument("--minutes", type=parse_range, default=(25, 120), help="每条时长范围 (分钟)")
+    parser.add_argument("--cross-midnight", type=float, default=0.1, help="跨零点记录的比例")
+    parser.add_argument("--offset-edge", type=float, default=0.05, help="分界点前后一小时内开始的记录比例")
+    parser.add_argument("--day-offset", type=int, default=4, help="写入设置的 day_offset_hour")
+    parser.add_argument("--no-pointer", action="store_true", help="不更新 pathCfg.json")
+    args = parser.parse_args()
+
+    if args.records is not None and sum(args.sessions) == 0:
+        parser.error("--records 需要 --sessions 的上限大于 0")
+
+    t0 = time.perf_counter()
+    total = generate_mock_data(
+        args.output, days=args.days, end=args.end, start=args.start, records=args.records,
+        seed=args.seed, sessions=args.sessions, distribution=args.distribution, minutes=args.minutes,
+        cross_midnight=args.cross_midnight, offset_edge=args.offset_edge, day_offset=args.day_offset,
+        write_pointer=not args.no_pointer)
+
+    print(f"[成功] 已生成测试数据: {args.output} ({time.perf_counter() - t0:.1f} s)")
+    print(f"       包含记录数: {total}")
+    print(f"       设置 Day Offset: {args.day_offset}")
+    if not args.no_pointer:
+        print(f"[成功] 已更新指针文件: {LOCAL_POINTER_FILE}")
+        print(f"       指向: {os.path.abspath(args.output)}")
 
-def generate_mock_data():
-    # 1. 定义新结构
-    data = {
-        "settings": {
-            "day_offset_hour": 4,      # 设置凌晨4点算新一天
-            "pomodoro_duration": 25
-        },
-        "records": []
-    }
-
-    # 2. 生成最近 14 天的数据
-    end_date = datetime.date.today()
-    start_date = end_date - datetime.timedelta(days=14)
-    
-    current_day = start_date
-    while current_day <= end_date:
-        # 每天生成 2-4 条记录
-        num_records = random.randint(2, 4)
-        
-        for _ in range(num_records):
-            # 随机开始时间：从早上9点到凌晨2点(次日)
-            # 模拟跨天逻辑：如果在凌晨 01:00 工作，应该属于 logical_date 的前一天
-            
-            # 基础时间：当天上午9点
-            base_time = datetime.datetime.combine(current_day, datetime.time(9, 0))
-            
-            # 随机增加 0 ~ 18小时 (即 09:00 ~ 次日 03:00)
-            start_dt = base_time + datetime.timedelta(hours=random.randint(0, 18), minutes=random.randint(0, 59))
-            
-            # 持续时间 25分钟 ~ 2小时
-            duration_minutes = random.randint(25, 120)
-            end_dt = start_dt + datetime.timedelta(minutes=duration_minutes)
-            
-            record = {
-                "start": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "end": end_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "duration": duration_minutes * 60
-            }
-            data["records"].append(record)
-        
-        current_day += datetime.timedelta(days=1)
-
-    # 3. 写入数据文件 work_data.json
-    filename = "work_data.json"
-    abs_path = os.path.abspath(filename)
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
-    print(f"[成功] 已生成测试数据: {filename}")
-    print(f"       包含记录数: {len(data['records'])}")
-    print(f"       设置 Day Offset: {data['settings']['day_offset_hour']}")
-
-    # 4. 写入指针文件 app_pointer.json
-    pointer_file = "app_pointer.json"
-    with open(pointer_file, 'w', encoding='utf-8') as f:
-        json.dump({"data_path": abs_path}, f, indent=4)
-    print(f"[成功] 已生成指针文件: {pointer_file}")
-    print(f"       指向: {abs_path}")
 
 if __name__ == "__main__":
-    generate_mock_data()
\ No newline at end of file
+    main()